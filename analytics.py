@@ -0,0 +1,161 @@
+
+from db import transaction, reading
+from export import add_date_filter
+
+# strftime patterns over the canonical 'YYYY-MM-DD HH:MM:SS' sale date
+PERIODS = {
+    "day": "%Y-%m-%d",
+    "week": "%Y-W%W",
+    "month": "%Y-%m",
+}
+
+SUMMARY = "sales_daily"
+
+# -------------------- Summary Table --------------------
+def create_summary(conn):
+    # Revenue per (day, product), folded in from sales past a rowid watermark.
+    # Edits and deletes of already-summarized sales are applied by triggers.
+    conn.execute("""CREATE TABLE IF NOT EXISTS sales_daily_summary(
+                    day TEXT,
+                    product_id TEXT,
+                    lines INTEGER,
+                    units INTEGER,
+                    revenue REAL,
+                    PRIMARY KEY(day, product_id)) WITHOUT ROWID""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS summary_state(
+                    name TEXT PRIMARY KEY,
+                    last_rowid INTEGER NOT NULL)""")
+    conn.execute("INSERT OR IGNORE INTO summary_state VALUES(?, 0)", (SUMMARY,))
+    summarized = f"(SELECT last_rowid FROM summary_state WHERE name = '{SUMMARY}')"
+    remove_old = """INSERT INTO sales_daily_summary VALUES (substr(old.date, 1, 10), old.product_id,
+                                                            -1, -old.quantity, -old.total)
+                    ON CONFLICT(day, product_id) DO UPDATE SET lines = lines + excluded.lines,
+                                                               units = units + excluded.units,
+                                                               revenue = revenue + excluded.revenue;"""
+    add_new = """INSERT INTO sales_daily_summary VALUES (substr(new.date, 1, 10), new.product_id,
+                                                         1, new.quantity, new.total)
+                 ON CONFLICT(day, product_id) DO UPDATE SET lines = lines + excluded.lines,
+                                                            units = units + excluded.units,
+                                                            revenue = revenue + excluded.revenue;"""
+    # Deleting the newest sales lets SQLite hand their rowids out again, so
+    # the watermark drops to the highest rowid still present.
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_sales_summary_delete AFTER DELETE ON sales
+                     WHEN old.rowid <= {summarized}
+                     BEGIN {remove_old}
+                         UPDATE summary_state SET last_rowid = MIN(last_rowid,
+                             (SELECT IFNULL(MAX(rowid), 0) FROM sales)) WHERE name = '{SUMMARY}';
+                     END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_sales_summary_update AFTER UPDATE ON sales
+                     WHEN old.rowid <= {summarized}
+                     BEGIN {remove_old} {add_new} END""")
+
+def refresh_summary(path=None):
+    # Folds in only the sales added since the last refresh
+    with transaction(path, immediate=True) as conn:
+        last = conn.execute("SELECT last_rowid FROM summary_state WHERE name=?", (SUMMARY,)).fetchone()[0]
+        high = conn.execute("SELECT MAX(rowid) FROM sales").fetchone()[0] or 0
+        if high <= last:
+            return 0
+        conn.execute("""INSERT INTO sales_daily_summary
+                        SELECT substr(date, 1, 10), product_id, COUNT(*), SUM(quantity), SUM(total)
+                        FROM sales WHERE rowid > ? AND rowid <= ?
+                        GROUP BY 1, 2
+                        ON CONFLICT(day, product_id) DO UPDATE SET lines = lines + excluded.lines,
+                                                                   units = units + excluded.units,
+                                                                   revenue = revenue + excluded.revenue""",
+                     (last, high))
+        conn.execute("UPDATE summary_state SET last_rowid=? WHERE name=?", (high, SUMMARY))
+    return high - last
+
+# -------------------- Helpers --------------------
+def sales_source(since=None, until=None, summary=False):
+    # Rows shaped (day/date, product_id, lines, units, revenue) from either
+    # the raw sales or the daily summary
+    if summary:
+        # Day granularity: times in the bounds are dropped
+        sql = "SELECT day AS date, product_id, lines, units, revenue FROM sales_daily_summary"
+        since, until = since and since[:10], until and until[:10]
+    else:
+        sql = ("SELECT date, product_id, customer_id, 1 AS lines, quantity AS units, "
+               "total AS revenue FROM sales")
+    return add_date_filter(sql, "date", since, until)
+
+def run(sql, params, path=None):
+    with reading(path) as conn:
+        return conn.execute(sql, params).fetchall()
+
+# -------------------- Reports --------------------
+def revenue_by_period(period="day", since=None, until=None, summary=False, path=None):
+    if summary:
+        refresh_summary(path)
+    source, params = sales_source(since, until, summary)
+    return run(f"""SELECT strftime('{PERIODS[period]}', date) AS period,
+                          SUM(lines), SUM(units), ROUND(SUM(revenue), 2),
+                          ROUND(SUM(SUM(revenue)) OVER (ORDER BY strftime('{PERIODS[period]}', date)), 2)
+                   FROM ({source}) GROUP BY period ORDER BY period""", params, path)
+
+def revenue_by_product(since=None, until=None, top=None, summary=False, path=None):
+    if summary:
+        refresh_summary(path)
+    source, params = sales_source(since, until, summary)
+    return run(f"""SELECT RANK() OVER (ORDER BY SUM(s.revenue) DESC), s.product_id,
+                          IFNULL(p.name, '-'), SUM(s.units), ROUND(SUM(s.revenue), 2),
+                          ROUND(100.0 * SUM(s.revenue) / SUM(SUM(s.revenue)) OVER (), 2)
+                   FROM ({source}) s LEFT JOIN products p ON p.product_id = s.product_id
+                   GROUP BY s.product_id ORDER BY SUM(s.revenue) DESC LIMIT ?""",
+               (*params, top or -1), path)
+
+def revenue_by_customer(since=None, until=None, top=None, path=None):
+    source, params = sales_source(since, until)
+    return run(f"""SELECT RANK() OVER (ORDER BY SUM(s.revenue) DESC), s.customer_id,
+                          IFNULL(c.name, '-'), SUM(s.lines), ROUND(SUM(s.revenue), 2),
+                          ROUND(100.0 * SUM(s.revenue) / SUM(SUM(s.revenue)) OVER (), 2)
+                   FROM ({source}) s LEFT JOIN customers c ON c.customer_id = s.customer_id
+                   GROUP BY s.customer_id ORDER BY SUM(s.revenue) DESC LIMIT ?""",
+               (*params, top or -1), path)
+
+def revenue_by_category(since=None, until=None, summary=False, path=None):
+    if summary:
+        refresh_summary(path)
+    source, params = sales_source(since, until, summary)
+    return run(f"""SELECT IFNULL(p.category, '-') AS category, COUNT(DISTINCT s.product_id),
+                          SUM(s.units), ROUND(SUM(s.revenue), 2),
+                          ROUND(100.0 * SUM(s.revenue) / SUM(SUM(s.revenue)) OVER (), 2)
+                   FROM ({source}) s LEFT JOIN products p ON p.product_id = s.product_id
+                   GROUP BY category ORDER BY SUM(s.revenue) DESC""", params, path)
+
+def top_per_category(top=3, since=None, until=None, summary=False, path=None):
+    if summary:
+        refresh_summary(path)
+    source, params = sales_source(since, until, summary)
+    return run(f"""SELECT category, rank, product_id, name, units, revenue FROM (
+                       SELECT IFNULL(p.category, '-') AS category, s.product_id, IFNULL(p.name, '-') AS name,
+                              SUM(s.units) AS units, ROUND(SUM(s.revenue), 2) AS revenue,
+                              ROW_NUMBER() OVER (PARTITION BY p.category ORDER BY SUM(s.revenue) DESC) AS rank
+                       FROM ({source}) s LEFT JOIN products p ON p.product_id = s.product_id
+                       GROUP BY s.product_id)
+                   WHERE rank <= ? ORDER BY category, rank""", (*params, top), path)
+
+HEADERS = {
+    "day": ["Day", "Lines", "Units", "Revenue", "Running Total"],
+    "week": ["Week", "Lines", "Units", "Revenue", "Running Total"],
+    "month": ["Month", "Lines", "Units", "Revenue", "Running Total"],
+    "product": ["Rank", "Product ID", "Name", "Units", "Revenue", "Share %"],
+    "customer": ["Rank", "Customer ID", "Name", "Lines", "Revenue", "Share %"],
+    "category": ["Category", "Products", "Units", "Revenue", "Share %"],
+    "top": ["Category", "Rank", "Product ID", "Name", "Units", "Revenue"],
+}
+
+def report(name, since=None, until=None, top=None, summary=False, path=None):
+    # summary reads sales_daily_summary; revenue by customer always scans sales
+    if name in PERIODS:
+        return revenue_by_period(name, since, until, summary, path)
+    if name == "product":
+        return revenue_by_product(since, until, top, summary, path)
+    if name == "customer":
+        return revenue_by_customer(since, until, top, path)
+    if name == "category":
+        return revenue_by_category(since, until, summary, path)
+    if name == "top":
+        return top_per_category(top or 3, since, until, summary, path)
+    raise ValueError(f"Unknown analytics report: {name}")
@@ -0,0 +1,169 @@
+
+import os
+import hmac
+import time
+import base64
+import hashlib
+import secrets
+import threading
+
+from db import connection, transaction
+
+# scrypt cost: about 70 ms and 16 MiB per hash
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+PBKDF2_ITERATIONS = 600000   # used where hashlib has no scrypt
+SESSION_TTL = 900            # seconds, renewed on every use
+CREDENTIAL_TTL = 300         # seconds a verified username/password is trusted
+
+# -------------------- Password Hashing --------------------
+def b64(data):
+    return base64.b64encode(data).decode()
+
+def hash_password(password, salt=None):
+    # 'scrypt$n$r$p$salt$hash' (or 'pbkdf2_sha256$iterations$salt$hash')
+    salt = salt or os.urandom(16)
+    if hasattr(hashlib, "scrypt"):
+        digest = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=32)
+        return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${b64(salt)}${b64(digest)}"
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS)
+    return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${b64(salt)}${b64(digest)}"
+
+def is_hashed(stored):
+    return (stored or "").startswith(("scrypt$", "pbkdf2_sha256$"))
+
+def verify_password(password, stored):
+    stored = stored or ""
+    if stored.startswith("scrypt$"):
+        _, n, r, p, salt, expected = stored.split("$")
+        digest = hashlib.scrypt(password.encode(), salt=base64.b64decode(salt),
+                                n=int(n), r=int(r), p=int(p), dklen=32)
+    elif stored.startswith("pbkdf2_sha256$"):
+        _, iterations, salt, expected = stored.split("$")
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), base64.b64decode(salt), int(iterations))
+    else:
+        # Plaintext left by an older version; rehashed on successful login
+        return hmac.compare_digest(password.encode(), stored.encode())
+    return hmac.compare_digest(digest, base64.b64decode(expected))
+
+def needs_rehash(stored):
+    if stored is None:
+        return False
+    if hasattr(hashlib, "scrypt"):
+        return not stored.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+    return not stored.startswith(f"pbkdf2_sha256${PBKDF2_ITERATIONS}$")
+
+def hash_existing(conn):
+    # Replaces every plaintext password in place. A NULL password never
+    # matched any login and stays NULL, so those accounts stay locked.
+    rows = conn.execute("SELECT user_id, password FROM users WHERE password IS NOT NULL").fetchall()
+    conn.executemany("UPDATE users SET password=? WHERE user_id=?",
+                     [(hash_password(password), user_id)
+                      for user_id, password in rows if not is_hashed(password)])
+
+# -------------------- Authentication --------------------
+_dummy_hash = None
+
+def authenticate(username, password, path=None):
+    # The user row with the password column blanked, or None. Unknown users
+    # cost a hash too, so timing doesn't reveal which usernames exist.
+    global _dummy_hash
+    with connection(path) as conn:
+        row = conn.execute("SELECT * FROM users WHERE username=?", (username,)).fetchone()
+    if not row or row[2] is None:
+        # Unknown users and accounts without a password (locked)
+        _dummy_hash = _dummy_hash or hash_password("")
+        verify_password(password, _dummy_hash)
+        return None
+    if not verify_password(password, row[2]):
+        return None
+    if needs_rehash(row[2]):
+        with transaction(path) as conn:
+            conn.execute("UPDATE users SET password=? WHERE user_id=? AND password=?",
+                         (hash_password(password), row[0], row[2]))
+    return (row[0], row[1], None, row[3])
+
+def set_password(username, password, path=None):
+    with transaction(path) as conn:
+        found = conn.execute("UPDATE users SET password=? WHERE username=?",
+                             (hash_password(password), username)).rowcount == 1
+    credentials.clear()
+    sessions.discard_user(username)
+    return found
+
+# -------------------- Sessions --------------------
+class SessionCache:
+    # In-memory map of opaque tokens (or credential fingerprints) to user
+    # rows, so only the first request pays for the password hash. Sliding
+    # entries are renewed on every use.
+    def __init__(self, ttl, sliding=True):
+        self.ttl = ttl
+        self.sliding = sliding
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def put(self, key, user):
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            if entry[1] <= now:
+                del self._entries[key]
+                return None
+            if self.sliding:
+                self._entries[key] = (entry[0], now + self.ttl)
+            return entry[0]
+
+    def discard(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def discard_user(self, username):
+        # Drops every entry held by that user, e.g. after a password change
+        with self._lock:
+            for key in [k for k, (user, _) in self._entries.items() if user[1] == username]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def prune(self):
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, (_, expires) in self._entries.items() if expires <= now]:
+                del self._entries[key]
+
+sessions = SessionCache(SESSION_TTL)
+credentials = SessionCache(CREDENTIAL_TTL, sliding=False)
+_fingerprint_key = os.urandom(32)
+
+def login(username, password, path=None):
+    # Returns (token, user) or None
+    user = authenticate(username, password, path)
+    if not user:
+        return None
+    sessions.prune()
+    token = secrets.token_urlsafe(32)
+    sessions.put(token, user)
+    return token, user
+
+def logout(token):
+    return sessions.discard(token)
+
+def check_credentials(username, password, path=None):
+    # Like authenticate(), but a repeat of a recently verified pair is
+    # answered from memory. Only a keyed digest of the pair is kept.
+    key = hmac.new(_fingerprint_key, f"{username}\0{password}".encode(), hashlib.sha256).digest()
+    user = credentials.get(key)
+    if user is None:
+        user = authenticate(username, password, path)
+        if user:
+            credentials.put(key, user)
+    return user
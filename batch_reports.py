@@ -0,0 +1,127 @@
+
+import os
+import time
+import argparse
+import multiprocessing
+from datetime import datetime, date, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tabulate import tabulate
+
+import db
+from export import REPORTS, BATCH_SIZE, report_query, write_csv
+
+SLICES = ["month", "week", "day", "none"]
+
+# -------------------- Planning --------------------
+def slice_start(day, slice_by):
+    if slice_by == "month":
+        return day.replace(day=1)
+    if slice_by == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+def next_slice(day, slice_by):
+    if slice_by == "month":
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=7 if slice_by == "week" else 1)
+
+def date_slices(first, last, slice_by):
+    # (label, since, until) covering first..last, until inclusive
+    start = slice_start(first, slice_by)
+    while start <= last:
+        end = next_slice(start, slice_by)
+        label = start.strftime("%Y-%m" if slice_by == "month" else "%Y-%m-%d")
+        yield label, max(start, first).isoformat(), min(end - timedelta(days=1), last).isoformat()
+        start = end
+
+def plan(out_dir, since=None, until=None, slice_by="month", gzip_output=False, path=None):
+    # One job per report, with the dated ones (sales) split into slices:
+    # (name, since, until, file_path). Largest jobs first.
+    suffix = ".csv.gz" if gzip_output else ".csv"
+    jobs = []
+    with db.reading(path) as conn:
+        for name, (_, _, date_col) in REPORTS.items():
+            if not date_col:
+                jobs.append((name, None, None, os.path.join(out_dir, name + suffix)))
+                continue
+            if slice_by == "none":
+                jobs.insert(0, (name, since, until, os.path.join(out_dir, name + suffix)))
+                continue
+            sql, params, _ = report_query(name, since, until)
+            # Separate MIN and MAX so each is a single index lookup
+            first = conn.execute(f"SELECT MIN({date_col}) FROM ({sql})", params).fetchone()[0]
+            last = conn.execute(f"SELECT MAX({date_col}) FROM ({sql})", params).fetchone()[0]
+            if not first:
+                continue
+            first, last = date.fromisoformat(first[:10]), date.fromisoformat(last[:10])
+            jobs[:0] = [(name, start, end, os.path.join(out_dir, f"{name}_{label}{suffix}"))
+                        for label, start, end in date_slices(first, last, slice_by)]
+    return jobs
+
+# -------------------- Workers --------------------
+def run_job(path, name, since, until, file_path, batch_size=BATCH_SIZE):
+    # Runs in a worker process on its own read-only connection
+    start = time.perf_counter()
+    sql, params, headers = report_query(name, since, until)
+    conn = db.connect_read_only(path)
+    try:
+        count = write_csv(conn, file_path, headers, sql, params, batch_size)
+    finally:
+        conn.close()
+    return count, time.perf_counter() - start
+
+def run_all(out_dir=None, since=None, until=None, slice_by="month", workers=None, gzip_output=False,
+            batch_size=BATCH_SIZE, progress=None, path=None):
+    # Writes every report to its own file in out_dir on a process pool.
+    # Each worker reads its own WAL snapshot, so reports started at
+    # different moments may differ by the writes committed in between.
+    # Returns (out_dir, [(file_path, rows, seconds)], wall seconds).
+    path = os.path.abspath(path or db.REPORT_DB or db.DB_NAME)
+    out_dir = out_dir or f"reports_{datetime.now():%Y%m%d_%H%M%S}"
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    jobs = plan(out_dir, since, until, slice_by, gzip_output, path)
+    results = []
+    # spawn: forked children would inherit the parent's pooled connections
+    with ProcessPoolExecutor(workers or os.cpu_count(), mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(run_job, path, name, job_since, job_until, file_path, batch_size): file_path
+                   for name, job_since, job_until, file_path in jobs}
+        for future in as_completed(futures):
+            count, seconds = future.result()
+            results.append((futures[future], count, seconds))
+            if progress:
+                progress(len(results), len(jobs))
+    results.sort()
+    return out_dir, results, time.perf_counter() - start
+
+SUMMARY_HEADERS = ["File", "Rows", "Seconds"]
+
+def print_summary(results, wall):
+    print(tabulate([(os.path.basename(f), f"{rows:,}", round(seconds, 2)) for f, rows, seconds in results],
+                   headers=SUMMARY_HEADERS, tablefmt="grid"))
+    busy = sum(seconds for _, _, seconds in results)
+    print(f"✅ {len(results)} files, {sum(rows for _, rows, _ in results):,} rows in {wall:.2f}s wall time "
+          f"({busy:.2f}s summed over files)")
+
+# -------------------- Command Line --------------------
+def add_arguments(parser):
+    parser.add_argument("--out", help="output directory (default: reports_<timestamp>)")
+    parser.add_argument("--since", help="YYYY-MM-DD (sales only)")
+    parser.add_argument("--until", help="YYYY-MM-DD, inclusive (sales only)")
+    parser.add_argument("--slice", choices=SLICES, default="month", help="split sales into one file per period")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--gzip", action="store_true", help="compress the files")
+
+def run(args):
+    out_dir, results, wall = run_all(args.out, args.since, args.until, args.slice, args.workers, args.gzip,
+                                     progress=lambda done, total: print(f"\r   {done}/{total} files written...",
+                                                                        end="", flush=True),
+                                     path=db.REPORT_DB or args.db)
+    print(f"\n✅ Reports written to {out_dir}")
+    print_summary(results, wall)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate every report in parallel")
+    parser.add_argument("--db", default=db.DB_NAME)
+    add_arguments(parser)
+    run(parser.parse_args())
@@ -0,0 +1,176 @@
+
+import os
+import sys
+import json
+import random
+import sqlite3
+import time
+import argparse
+
+import db
+import services
+import analytics
+import reorder
+from ids import next_id
+from cache import product_cache
+from export import export_report, REPORTS
+from search import search
+import datagen
+
+REGRESSION = 1.2     # --compare fails when a p50 gets this much slower...
+MIN_DELTA_MS = 0.05  # ...and by more than this, so microsecond jitter is ignored
+
+# -------------------- Helpers --------------------
+def ops_per_sec(fn, seconds):
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        fn()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+def timed(fn, runs, seconds):
+    # Runs fn until runs calls or seconds have passed (at least once).
+    # Returns the sorted per-call latencies.
+    times = []
+    deadline = time.perf_counter() + seconds
+    while len(times) < runs and (not times or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return sorted(times)
+
+def percentile(times, pct):
+    return times[min(len(times) - 1, round(pct / 100 * (len(times) - 1)))]
+
+def summarize(name, times):
+    return {"name": name, "runs": len(times), "p50_ms": percentile(times, 50) * 1000,
+            "p99_ms": percentile(times, 99) * 1000, "ops_per_sec": len(times) / sum(times)}
+
+# -------------------- Connection Benchmark --------------------
+def bench_connections(path, seconds):
+    def per_call():
+        conn = sqlite3.connect(path)
+        cur = conn.cursor()
+        cur.execute("SELECT name, price, quantity FROM products WHERE product_id=?", ("PR_1",))
+        cur.fetchone()
+        conn.close()
+
+    def pooled():
+        with db.connection(path) as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT name, price, quantity FROM products WHERE product_id=?", ("PR_1",))
+            cur.fetchone()
+
+    before = ops_per_sec(per_call, seconds)
+    after = ops_per_sec(pooled, seconds)
+    print(f"{'point lookup, connect per call':<36}{before:>12,.0f} ops/sec")
+    print(f"{'point lookup, pooled connection':<36}{after:>12,.0f} ops/sec")
+    print(f"{'speedup':<36}{after / before:>12.1f}x")
+
+# -------------------- Operation Benchmarks --------------------
+def operations(rng, products, customers, export_dir):
+    # (name, fn, runs). Operations use the default database (db.DB_NAME);
+    # checkout and generate_id write to it.
+    def product():
+        return f"PR_{rng.randint(1, products)}"
+
+    def generate_id():
+        with db.transaction(immediate=True) as conn:
+            next_id(conn, "CU")
+
+    def checkout():
+        basket = [(product(), 1) for _ in range(3)]
+        services.record_sale(f"CU_{rng.randint(1, customers)}", basket, allow_partial=True)
+
+    def lookup():
+        with db.connection() as conn:
+            conn.execute("SELECT * FROM products WHERE product_id=?", (product(),)).fetchone()
+
+    def cached_lookup():
+        product_cache.get(product())
+
+    def report(name):
+        return lambda: sum(1 for _ in services.report_rows(name))
+
+    def stats(name):
+        return lambda: analytics.report(name, summary=name != "customer")
+
+    def find():
+        search(rng.choice(datagen.NOUNS)[:4])
+
+    def export():
+        file_path, _ = export_report("sales_report", gzip_output=False)
+        os.replace(file_path, os.path.join(export_dir, os.path.basename(file_path)))
+
+    ops = [("generate_id", generate_id, 500), ("checkout (3 lines)", checkout, 300),
+           ("product lookup", lookup, 5000), ("product lookup, cached", cached_lookup, 50000),
+           ("search", find, 300)]
+    ops += [(name, report(name), 5) for name in REPORTS]
+    ops += [(f"analytics {name}", stats(name), 5) for name in ("month", "product", "customer", "category")]
+    ops += [("reorder alerts", reorder.alerts, 5), ("export sales_report", export, 3)]
+    return ops
+
+def bench_operations(seconds, only=None, seed=1):
+    with db.connection() as conn:
+        products = conn.execute("SELECT COUNT(*) FROM products").fetchone()[0]
+        customers = conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+    if not products or not customers:
+        raise ValueError("The benchmark database has no products or customers; run datagen.py first.")
+    export_dir = os.path.join(os.path.dirname(os.path.abspath(db.DB_NAME)), "bench_exports")
+    os.makedirs(export_dir, exist_ok=True)
+    product_cache.warm()
+    results = []
+    print(f"{'operation':<28}{'runs':>8}{'p50 ms':>12}{'p99 ms':>12}{'ops/sec':>14}")
+    for name, fn, runs in operations(random.Random(seed), products, customers, export_dir):
+        if only and not any(word in name for word in only):
+            continue
+        result = summarize(name, timed(fn, runs, seconds))
+        results.append(result)
+        print(f"{name:<28}{result['runs']:>8}{result['p50_ms']:>12.3f}{result['p99_ms']:>12.3f}"
+              f"{result['ops_per_sec']:>14,.1f}")
+    return results
+
+def compare(results, baseline_path, threshold=REGRESSION):
+    # Operations whose p50 is more than threshold times the baseline's
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    slower = []
+    for result in results:
+        before = baseline.get(result["name"])
+        if (before and result["p50_ms"] > before["p50_ms"] * threshold
+                and result["p50_ms"] - before["p50_ms"] > MIN_DELTA_MS):
+            slower.append((result["name"], before["p50_ms"], result["p50_ms"]))
+    return slower
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inventory database benchmarks")
+    parser.add_argument("--db", default="bench_inventory.db")
+    parser.add_argument("--scale", choices=sorted(datagen.SCALES), default="small",
+                        help="size of the generated database when --db doesn't exist yet")
+    parser.add_argument("--seconds", type=float, default=2.0, help="time limit per operation")
+    parser.add_argument("--only", nargs="+", help="run operations whose name contains one of these words")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="fail if p50 latencies regressed against this saved JSON file")
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        print(f"Generating {args.scale} database {args.db}...")
+        datagen.generate(args.db, *datagen.SCALES[args.scale], progress=datagen.print_progress)
+        print()
+    db.DB_NAME = args.db
+    bench_connections(args.db, args.seconds)
+    print()
+    results = bench_operations(args.seconds, args.only)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"db": args.db, "taken_at": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results},
+                      f, indent=2)
+        print(f"✅ Results saved to {args.save}")
+    if args.compare:
+        slower = compare(results, args.compare)
+        for name, before, after in slower:
+            print(f"❌ {name}: p50 {before:.3f} ms -> {after:.3f} ms")
+        if slower:
+            sys.exit(1)
+        print(f"✅ No operation is more than {REGRESSION - 1:.0%} slower than {args.compare}.")
@@ -0,0 +1,212 @@
+
+import csv
+import gzip
+import json
+import time
+import argparse
+from datetime import datetime
+
+import db
+from db import transaction
+from ids import reserve_ids
+import ledger
+
+BATCH_SIZE = 50000
+CHUNK_SIZE = 900    # keys per IN (...) lookup, under SQLite's variable limit
+
+def text(value):
+    value = (value or "").strip() if isinstance(value, str) else value
+    if value in (None, ""):
+        raise ValueError("is blank")
+    return str(value)
+
+def optional(convert):
+    def wrapped(value):
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return None
+        return convert(value)
+    return wrapped
+
+def positive_int(value):
+    value = int(value)
+    if value < 0:
+        raise ValueError("is negative")
+    return value
+
+def at_least_one(value):
+    value = int(value)
+    if value < 1:
+        raise ValueError("must be at least 1")
+    return value
+
+def date_value(value):
+    return datetime.fromisoformat(str(value).strip()).strftime("%Y-%m-%d %H:%M:%S")
+
+# entity -> (ID prefix, [(field, converter)], INSERT taking the new ID first)
+ENTITIES = {
+    "suppliers": ("SP", [("name", text), ("contact", text), ("address", text)],
+                  "INSERT INTO suppliers VALUES(?,?,?,?)"),
+    "products": ("PR", [("name", text), ("category", text), ("size", text),
+                        ("quantity", positive_int), ("price", float), ("supplier_id", text)],
+                 "INSERT INTO products VALUES(?,?,?,?,?,?,?)"),
+    "customers": ("CU", [("name", text), ("contact", text)],
+                  "INSERT INTO customers VALUES(?,?,?)"),
+    # Historical sales: stock is not touched, a missing total is priced from products
+    "sales": ("SL", [("product_id", text), ("customer_id", text), ("quantity", at_least_one),
+                     ("total", optional(float)), ("date", optional(date_value))],
+              """INSERT INTO sales SELECT ?1, ?2, ?3, ?4,
+                        COALESCE(?5, ?4 * (SELECT price FROM products WHERE product_id = ?2)),
+                        COALESCE(?6, datetime('now', 'localtime'))"""),
+}
+
+# entity -> [(position in the validated values, table, key)] that must exist
+REFERENCES = {
+    "sales": [(0, "products", "product_id"), (1, "customers", "customer_id")],
+}
+
+# -------------------- Readers --------------------
+def open_input(file_path):
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, "rt", newline="")
+    return open(file_path, newline="")
+
+def read_rows(file_path):
+    # Yields (line number, dict, error) without loading the file. Lines that
+    # aren't a JSON object come with an error and the raw line as the row.
+    name = file_path[:-3] if file_path.endswith(".gz") else file_path
+    with open_input(file_path) as f:
+        if name.endswith((".jsonl", ".ndjson")):
+            for num, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield num, line.rstrip("\n"), f"invalid JSON: {e}"
+                    continue
+                yield num, row, None if isinstance(row, dict) else "not a JSON object"
+        else:
+            for num, row in enumerate(csv.DictReader(f), 2):
+                yield num, row, None
+
+def validate(fields, row):
+    values = []
+    for field, convert in fields:
+        try:
+            values.append(convert(row.get(field)))
+        except (TypeError, ValueError) as e:
+            return None, f"{field}: {e}"
+    return tuple(values), None
+
+def missing_keys(conn, table, key, values):
+    values = list(set(values))
+    found = set()
+    for i in range(0, len(values), CHUNK_SIZE):
+        chunk = values[i:i + CHUNK_SIZE]
+        found.update(row[0] for row in conn.execute(
+            f"SELECT {key} FROM {table} WHERE {key} IN ({','.join('?' * len(chunk))})", chunk))
+    return set(values) - found
+
+# -------------------- Index Deferral --------------------
+def drop_indexes(table, path=None):
+    # Secondary indexes plus the full-text triggers; both are rebuilt in one
+    # pass afterwards, which is much cheaper than maintaining them per row.
+    with transaction(path, immediate=True) as conn:
+        saved = conn.execute("""SELECT type, name, sql FROM sqlite_master
+                                WHERE tbl_name=? AND sql IS NOT NULL
+                                  AND (type='index' OR (type='trigger' AND name LIKE ?))""",
+                             (table, f"trg_{table}_fts_%")).fetchall()
+        for kind, name, _ in saved:
+            conn.execute(f"DROP {kind.upper()} {name}")
+    return saved
+
+def restore_indexes(saved, table, path=None):
+    with transaction(path, immediate=True) as conn:
+        for _, _, sql in saved:
+            conn.execute(sql)
+        if any(kind == "trigger" for kind, _, _ in saved):
+            conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+# -------------------- Loader --------------------
+def load(entity, file_path, batch_size=BATCH_SIZE, defer_indexes=False, rejects_path=None,
+         progress=None, path=None):
+    prefix, fields, insert = ENTITIES[entity]
+    stats = {"loaded": 0, "rejected": 0, "seconds": 0.0}
+    start = time.perf_counter()
+    rejects = open(rejects_path, "w") if rejects_path else None
+
+    def reject(num, error, row):
+        stats["rejected"] += 1
+        if rejects:
+            rejects.write(json.dumps({"line": num, "error": error, "row": row}) + "\n")
+
+    def flush(batch):
+        # One transaction per batch: IDs are reserved as a block in the same
+        # transaction, so a failed batch gives its whole range back.
+        # batch holds (line number, raw row, values).
+        with transaction(path, immediate=True) as conn:
+            for pos, table, key in REFERENCES.get(entity, []):
+                missing = missing_keys(conn, table, key, [item[2][pos] for item in batch])
+                if missing:
+                    for num, row, values in batch:
+                        if values[pos] in missing:
+                            reject(num, f"{key}: {values[pos]} not found", row)
+                    batch = [item for item in batch if item[2][pos] not in missing]
+            if not batch:
+                return
+            ids = reserve_ids(conn, prefix, len(batch))
+            rows = [(f"{prefix}_{num}", *item[2]) for num, item in zip(ids, batch)]
+            conn.executemany(insert, rows)
+            if entity == "products":
+                ledger.log(conn, [(row[0], ledger.OPENING, row[4], None, "imported") for row in rows])
+        stats["loaded"] += len(batch)
+        if progress:
+            progress(stats["loaded"])
+
+    indexes = drop_indexes(entity, path) if defer_indexes else []
+    try:
+        batch = []
+        for num, row, error in read_rows(file_path):
+            values, error = (None, error) if error else validate(fields, row)
+            if error:
+                reject(num, error, row)
+                continue
+            batch.append((num, row, values))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        if indexes:
+            restore_indexes(indexes, entity, path)
+        if rejects:
+            rejects.close()
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def print_stats(stats):
+    rate = stats["loaded"] / stats["seconds"] if stats["seconds"] else 0
+    print(f"✅ Loaded {stats['loaded']:,} rows in {stats['seconds']:.2f}s ({rate:,.0f} rows/sec), "
+          f"rejected {stats['rejected']:,}.")
+
+def add_arguments(parser):
+    parser.add_argument("entity", choices=sorted(ENTITIES))
+    parser.add_argument("file", help="CSV or JSONL file, optionally .gz")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--defer-indexes", action="store_true",
+                        help="drop the table's secondary indexes during the load and rebuild them after")
+    parser.add_argument("--rejects", help="write rejected rows with their errors to this JSONL file")
+
+def run(args):
+    stats = load(args.entity, args.file, args.batch_size, args.defer_indexes, args.rejects,
+                 progress=lambda n: print(f"\r   {n:,} rows loaded...", end="", flush=True),
+                 path=args.db)
+    print()
+    print_stats(stats)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load rows into the inventory database")
+    parser.add_argument("--db", default=db.DB_NAME)
+    add_arguments(parser)
+    run(parser.parse_args())
@@ -0,0 +1,216 @@
+
+import csv
+import math
+import argparse
+from datetime import datetime
+from tabulate import tabulate
+
+import db
+import ledger
+from db import connection, transaction
+from cache import product_cache
+
+try:
+    import numpy as np
+except ImportError:  # optional: the same arithmetic runs in plain Python
+    np = None
+
+CHUNK_SIZE = 900    # IDs per IN (...) lookup, under SQLite's variable limit
+
+# -------------------- Selecting Products --------------------
+def product_filter(category=None, supplier_id=None, ids=None):
+    # WHERE clause and params; at least one filter is required
+    clauses, params = [], []
+    if category:
+        clauses.append("category = ?")
+        params.append(category)
+    if supplier_id:
+        clauses.append("supplier_id = ?")
+        params.append(supplier_id)
+    if ids:
+        clauses.append(f"product_id IN ({','.join('?' * len(ids))})")
+        params.extend(ids)
+    if not clauses:
+        raise ValueError("Choose products by category, supplier, IDs or a CSV file")
+    return " AND ".join(clauses), params
+
+def read_deltas(file_path):
+    # CSV with product_id and price_change and/or quantity_change columns.
+    # price_change is an amount (0.50, -1) or a percentage (5%); blank
+    # cells leave that value alone. Returns {product_id: (pct, amount, units)}.
+    deltas = {}
+    with open(file_path, newline="") as f:
+        for line, row in enumerate(csv.DictReader(f), 2):
+            pid = (row.get("product_id") or "").strip()
+            if not pid:
+                raise ValueError(f"{file_path}:{line}: product_id is required")
+            price = (row.get("price_change") or "").strip()
+            units = (row.get("quantity_change") or "").strip()
+            try:
+                pct = float(price[:-1]) if price.endswith("%") else 0.0
+                amount = float(price) if price and not price.endswith("%") else 0.0
+                units = int(units) if units else 0
+            except ValueError:
+                raise ValueError(f"{file_path}:{line}: bad price_change or quantity_change")
+            deltas[pid] = (pct, amount, units)
+    return deltas
+
+def load_rows(conn, where=None, params=(), ids=None):
+    # (product_ids, prices, quantities) as parallel lists
+    if ids is None:
+        rows = conn.execute(f"SELECT product_id, IFNULL(price, 0), IFNULL(quantity, 0) FROM products "
+                            f"WHERE {where} ORDER BY product_id", params).fetchall()
+    else:
+        rows = []
+        for i in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[i:i + CHUNK_SIZE]
+            rows += conn.execute(f"SELECT product_id, IFNULL(price, 0), IFNULL(quantity, 0) FROM products "
+                                 f"WHERE product_id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+        rows.sort()
+    return [list(column) for column in zip(*rows)] or [[], [], []]
+
+# -------------------- Vectorized Plan --------------------
+def compute(prices, quantities, pct, amount, price_set, units, stock_set):
+    # New prices and quantities for whole columns at once. pct, amount and
+    # units are per-row lists; price_set and stock_set (None = unused)
+    # replace the value for every row. Prices without a change keep their
+    # exact value; new ones are rounded half up to the cent with the same
+    # float operations either way, so NumPy and plain Python agree.
+    if np is not None:
+        prices, quantities = np.asarray(prices, dtype=float), np.asarray(quantities, dtype=np.int64)
+        pct, amount = np.asarray(pct, dtype=float), np.asarray(amount, dtype=float)
+        if price_set is not None:
+            new_prices = np.full(len(prices), float(price_set))
+        else:
+            new_prices = np.where((pct == 0) & (amount == 0), prices,
+                                  np.floor((prices * (1 + pct / 100) + amount) * 100 + 0.5) / 100)
+        if stock_set is not None:
+            new_quantities = np.full(len(quantities), int(stock_set), dtype=np.int64)
+        else:
+            new_quantities = quantities + np.asarray(units, dtype=np.int64)
+        return new_prices.tolist(), new_quantities.tolist()
+    if price_set is not None:
+        new_prices = [float(price_set)] * len(prices)
+    else:
+        new_prices = [math.floor((p * (1 + r / 100) + a) * 100 + 0.5) / 100 if r or a else p
+                      for p, r, a in zip(prices, pct, amount)]
+    if stock_set is not None:
+        new_quantities = [int(stock_set)] * len(quantities)
+    else:
+        new_quantities = [q + u for q, u in zip(quantities, units)]
+    return new_prices, new_quantities
+
+def plan(conn, category=None, supplier_id=None, ids=None, deltas=None, price_pct=0.0, price_add=0.0,
+         price_set=None, stock_add=0, stock_set=None):
+    # Works out every affected product's new price and quantity without
+    # writing. Returns the changed rows (product_id, old price, new price,
+    # old quantity, new quantity) and a summary.
+    if deltas is not None:
+        pids, prices, quantities = load_rows(conn, ids=sorted(deltas))
+        missing = len(deltas) - len(pids)
+        pct = [deltas[pid][0] for pid in pids]
+        amount = [deltas[pid][1] for pid in pids]
+        units = [deltas[pid][2] for pid in pids]
+    else:
+        where, params = product_filter(category, supplier_id, ids)
+        pids, prices, quantities = load_rows(conn, where, params)
+        missing = len(set(ids)) - len(pids) if ids else 0
+        pct, amount, units = [price_pct] * len(pids), [price_add] * len(pids), [stock_add] * len(pids)
+    new_prices, new_quantities = compute(prices, quantities, pct, amount, price_set, units, stock_set)
+
+    changed = [row for row in zip(pids, prices, new_prices, quantities, new_quantities)
+               if row[1] != row[2] or row[3] != row[4]]
+    summary = {
+        "matched": len(pids),
+        "missing": missing,
+        "changed": len(changed),
+        "price_changes": sum(1 for row in changed if row[1] != row[2]),
+        "stock_changes": sum(1 for row in changed if row[3] != row[4]),
+        "units_delta": sum(row[4] - row[3] for row in changed),
+        "value_before": round(sum(p * q for p, q in zip(prices, quantities)), 2),
+        "value_after": round(sum(p * q for p, q in zip(new_prices, new_quantities)), 2),
+        "negative_prices": sum(1 for row in changed if row[2] < 0),
+        "negative_stock": sum(1 for row in changed if row[4] < 0),
+    }
+    return changed, summary
+
+# -------------------- Preview & Apply --------------------
+def preview(path=None, **options):
+    with connection(path) as conn:
+        return plan(conn, **options)
+
+def apply(note="bulk update", path=None, **options):
+    # Recomputes the plan under the write lock and writes it in one
+    # transaction: prices with one batched UPDATE, stock through the ledger
+    # as adjustment movements sharing one reference.
+    with transaction(path, immediate=True) as conn:
+        changed, summary = plan(conn, **options)
+        if summary["negative_prices"] or summary["negative_stock"]:
+            raise ValueError(f"Not applied: {summary['negative_prices']} price(s) and "
+                             f"{summary['negative_stock']} stock level(s) would go below zero")
+        product_cache.invalidate([row[0] for row in changed])
+        conn.executemany("UPDATE products SET price=? WHERE product_id=?",
+                         [(row[2], row[0]) for row in changed if row[1] != row[2]])
+        moves = [(row[0], row[4] - row[3]) for row in changed if row[3] != row[4]]
+        conn.executemany("UPDATE products SET quantity = IFNULL(quantity, 0) + ? WHERE product_id=?",
+                         [(units, pid) for pid, units in moves])
+        reference = f"BULK_{datetime.now():%Y%m%d_%H%M%S}"
+        ledger.log(conn, [(pid, ledger.ADJUSTMENT, units, reference, note) for pid, units in moves])
+    product_cache.flush()
+    return changed, summary
+
+ROW_HEADERS = ["Product ID", "Old Price", "New Price", "Old Qty", "New Qty"]
+
+def summary_lines(summary):
+    lines = [f"{summary['matched']:,} products matched, {summary['changed']:,} to change "
+             f"({summary['price_changes']:,} prices, {summary['stock_changes']:,} stock levels)",
+             f"Units {summary['units_delta']:+,}; stock value {summary['value_before']:,.2f} → "
+             f"{summary['value_after']:,.2f} ({summary['value_after'] - summary['value_before']:+,.2f})"]
+    if summary["missing"]:
+        lines.append(f"⚠️ {summary['missing']:,} product ID(s) not found")
+    if summary["negative_prices"] or summary["negative_stock"]:
+        lines.append(f"❌ {summary['negative_prices']:,} price(s) and {summary['negative_stock']:,} "
+                     f"stock level(s) would go below zero")
+    return lines
+
+# -------------------- Command Line --------------------
+def options_from_args(args):
+    return {"category": args.category, "supplier_id": args.supplier,
+            "ids": args.ids and [pid.strip() for pid in args.ids.split(",") if pid.strip()],
+            "deltas": read_deltas(args.csv) if args.csv else None,
+            "price_pct": args.price_pct, "price_add": args.price_add, "price_set": args.price_set,
+            "stock_add": args.stock_add, "stock_set": args.stock_set}
+
+def add_arguments(parser):
+    parser.add_argument("--category")
+    parser.add_argument("--supplier", help="supplier ID")
+    parser.add_argument("--ids", help="comma-separated product IDs")
+    parser.add_argument("--csv", help="file with product_id, price_change (0.50 or 5%%) and quantity_change")
+    parser.add_argument("--price-pct", type=float, default=0.0, help="change prices by this percentage")
+    parser.add_argument("--price-add", type=float, default=0.0, help="add this amount to prices")
+    parser.add_argument("--price-set", type=float, help="set prices to this value")
+    parser.add_argument("--stock-add", type=int, default=0, help="add (or with a minus, remove) units")
+    parser.add_argument("--stock-set", type=int, help="set stock to this quantity")
+    parser.add_argument("--note", default="bulk update", help="note on the stock movements")
+    parser.add_argument("--show", type=int, default=20, help="rows to list (default: %(default)s)")
+    parser.add_argument("--apply", action="store_true", help="write the changes (default: preview only)")
+
+def run(args):
+    options = options_from_args(args)
+    if args.apply:
+        changed, summary = apply(args.note, path=args.db, **options)
+    else:
+        changed, summary = preview(path=args.db, **options)
+    if changed and args.show:
+        print(tabulate(changed[:args.show], headers=ROW_HEADERS, tablefmt="grid"))
+        if len(changed) > args.show:
+            print(f"... and {len(changed) - args.show:,} more")
+    for line in summary_lines(summary):
+        print(line)
+    print("✅ Changes applied." if args.apply else "Preview only: add --apply to write these changes.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk price and stock updates with a dry-run preview")
+    parser.add_argument("--db", default=db.DB_NAME)
+    add_arguments(parser)
+    run(parser.parse_args())
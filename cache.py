@@ -0,0 +1,115 @@
+
+import time
+import threading
+from collections import OrderedDict
+
+from db import connection
+
+MAX_ENTRIES = 50000
+TTL = 300.0  # seconds; bounds staleness from writers in other processes
+
+# -------------------- Product Cache --------------------
+class ProductCache:
+    # Read-through LRU cache of full product rows. Writers call invalidate()
+    # when they touch a product and flush() after committing. Both bump the
+    # product's generation, and a miss only stores the row it read if the
+    # generation hasn't moved since: a reader that read before the commit
+    # and stores after the flush would otherwise keep the old row until TTL.
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._rows = OrderedDict()
+        self._dirty = set()
+        self._generation = 0   # bumped for every invalidated product
+        self._changed = {}     # product_id -> generation of its last invalidation
+        self._floor = 0        # rows read before this generation are never stored
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, product_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._rows.get(product_id)
+            if entry and entry[1] > now:
+                self._rows.move_to_end(product_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            read_at = self._generation
+        with connection(self.path) as conn:
+            row = conn.execute("SELECT * FROM products WHERE product_id=?", (product_id,)).fetchone()
+        if row:
+            self._store([row], now, read_at)
+        return row
+
+    def _store(self, rows, now, read_at):
+        expires = now + self.ttl
+        with self._lock:
+            if read_at < self._floor:
+                return
+            for row in rows:
+                if self._changed.get(row[0], 0) > read_at:
+                    continue
+                self._rows[row[0]] = (row, expires)
+                self._rows.move_to_end(row[0])
+            while len(self._rows) > self.max_entries:
+                self._rows.popitem(last=False)
+                self.evictions += 1
+
+    def _bump(self, product_ids):
+        # Called with the lock held
+        self._generation += 1
+        for pid in product_ids:
+            self._rows.pop(pid, None)
+            self._changed[pid] = self._generation
+        if len(self._changed) > self.max_entries:
+            # Bounded: forget per-product generations, refuse every older read
+            self._changed.clear()
+            self._floor = self._generation
+
+    def invalidate(self, product_ids):
+        with self._lock:
+            product_ids = list(product_ids)
+            self._dirty.update(product_ids)
+            self._bump(product_ids)
+
+    def flush(self):
+        with self._lock:
+            self._bump(self._dirty)
+            self._dirty.clear()
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._dirty.clear()
+            self._changed.clear()
+            self._generation += 1
+            self._floor = self._generation
+
+    def warm(self, limit=None, batch_size=5000):
+        # Preload the most recently added products, up to the cache size
+        limit = min(limit or self.max_entries, self.max_entries)
+        loaded = 0
+        with self._lock:
+            read_at = self._generation
+        with connection(self.path) as conn:
+            cur = conn.execute("SELECT * FROM products ORDER BY rowid DESC LIMIT ?", (limit,))
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                self._store(reversed(rows), time.monotonic(), read_at)
+                loaded += len(rows)
+        return loaded
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._rows), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions,
+                    "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0}
+
+product_cache = ProductCache()
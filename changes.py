@@ -0,0 +1,161 @@
+
+import os
+import json
+import argparse
+from tabulate import tabulate
+
+import db
+from db import connection, transaction
+
+# table -> key column of the tables whose changes are captured
+TABLES = {"suppliers": "supplier_id", "products": "product_id", "customers": "customer_id", "sales": "sale_id"}
+INSERT, UPDATE, DELETE = "insert", "update", "delete"
+BATCH_SIZE = 5000
+
+# -------------------- Change Log --------------------
+def create_change_log(conn):
+    # One row per changed key, numbered by a sequence that never goes back
+    # (AUTOINCREMENT), even after old entries are pruned. Only keys are
+    # logged: a delta reads the current row, so a key changed many times
+    # since the last export is sent once.
+    conn.execute("""CREATE TABLE IF NOT EXISTS change_log(
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    table_name TEXT NOT NULL,
+                    row_key TEXT NOT NULL,
+                    op TEXT NOT NULL,
+                    changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')))""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_change_log_table ON change_log(table_name, seq)")
+    for table, key in TABLES.items():
+        log = f"INSERT INTO change_log(table_name, row_key, op) VALUES('{table}',"
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_cdc_insert AFTER INSERT ON {table}
+                         BEGIN {log} new.{key}, 'I'); END""")
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_cdc_update AFTER UPDATE ON {table}
+                         BEGIN
+                             INSERT INTO change_log(table_name, row_key, op)
+                             SELECT '{table}', old.{key}, 'D' WHERE old.{key} IS NOT new.{key};
+                             {log} new.{key}, 'U');
+                         END""")
+        conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_cdc_delete AFTER DELETE ON {table}
+                         BEGIN {log} old.{key}, 'D'); END""")
+
+def state_name(consumer, table):
+    # Export watermarks live in summary_state next to the other ones, one
+    # per consumer and table
+    return f"cdc:{consumer}:{table}"
+
+def watermark(conn, consumer, table):
+    row = conn.execute("SELECT last_rowid FROM summary_state WHERE name=?",
+                       (state_name(consumer, table),)).fetchone()
+    return row[0] if row else None
+
+def delta_sql(table, full=False):
+    # (op, seq, row columns...) for every key changed in (low, high]; keys
+    # whose row is gone come out as deletes with only the key set. With
+    # full, every current row comes out as an insert.
+    key = TABLES[table]
+    if full:
+        return f"SELECT '{INSERT}', :high, t.* FROM {table} t ORDER BY t.rowid"
+    return f"""SELECT CASE WHEN t.{key} IS NULL THEN '{DELETE}'
+                           WHEN c.inserted THEN '{INSERT}' ELSE '{UPDATE}' END,
+                      c.seq, t.*, c.row_key
+               FROM (SELECT row_key, MAX(seq) AS seq, MAX(op = 'I') AS inserted FROM change_log
+                     WHERE table_name = '{table}' AND seq > :low AND seq <= :high
+                     GROUP BY row_key) c
+               LEFT JOIN {table} t ON t.{key} = c.row_key
+               ORDER BY c.seq"""
+
+# -------------------- Delta Export --------------------
+def export_changes(consumer, out_dir=".", tables=None, full=False, batch_size=BATCH_SIZE, path=None):
+    # Writes <table>_changes_<from>_<to>.jsonl per table with the changes
+    # since the consumer's watermark for it, then moves the watermarks. A
+    # table the consumer hasn't exported yet (or full=True) gets every row
+    # instead. Each line is {"op": insert|update|delete, "seq": n, "row": {...}}.
+    # Returns (high, [(file_path, lines)]).
+    tables = tables or list(TABLES)
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    # One read transaction: every table is exported as of the same seq
+    with transaction(path) as conn:
+        high = conn.execute("SELECT IFNULL(MAX(seq), 0) FROM change_log").fetchone()[0]
+        for table in tables:
+            low = watermark(conn, consumer, table)
+            if low == high and not full:
+                continue
+            everything = full or low is None
+            file_path = os.path.join(out_dir, f"{table}_changes_{'full' if everything else low}_{high}.jsonl")
+            written.append((file_path, write_delta(conn, file_path, table, everything, low, high, batch_size)))
+    # The watermarks move only once the files are complete
+    with transaction(path, immediate=True) as conn:
+        conn.executemany("INSERT OR REPLACE INTO summary_state VALUES(?, ?)",
+                         [(state_name(consumer, table), high) for table in tables])
+    return high, written
+
+def write_delta(conn, file_path, table, full, low, high, batch_size=BATCH_SIZE):
+    key = TABLES[table]
+    cur = conn.execute(delta_sql(table, full), {"low": low, "high": high})
+    columns = [d[0] for d in cur.description[2:]]
+    if not full:
+        columns = columns[:-1]
+    count = 0
+    with open(file_path + ".tmp", "w") as f:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                op, seq = row[0], row[1]
+                values = {key: row[-1]} if op == DELETE else dict(zip(columns, row[2:]))
+                f.write(json.dumps({"op": op, "seq": seq, "row": values}) + "\n")
+            count += len(rows)
+    os.replace(file_path + ".tmp", file_path)
+    return count
+
+def prune(path=None):
+    # Drops log entries every consumer has exported. With no consumers all
+    # of them go: a new consumer starts with a full export anyway.
+    with transaction(path, immediate=True) as conn:
+        done = conn.execute("""SELECT IFNULL((SELECT MIN(last_rowid) FROM summary_state WHERE name LIKE 'cdc:%'),
+                                             (SELECT MAX(seq) FROM change_log))""").fetchone()[0]
+        if done is None:
+            return 0
+        return conn.execute("DELETE FROM change_log WHERE seq <= ?", (done,)).rowcount
+
+def status(path=None):
+    # (consumer, table, watermark, changes waiting)
+    with connection(path) as conn:
+        rows = conn.execute("SELECT name, last_rowid FROM summary_state WHERE name LIKE 'cdc:%' ORDER BY name")
+        return [(*name.split(":")[1:], last, conn.execute(
+                    "SELECT COUNT(*) FROM change_log WHERE table_name=? AND seq > ?",
+                    (name.split(":")[2], last)).fetchone()[0])
+                for name, last in rows.fetchall()]
+
+STATUS_HEADERS = ["Consumer", "Table", "Watermark", "Pending Changes"]
+
+# -------------------- Command Line --------------------
+def add_arguments(parser):
+    actions = parser.add_subparsers(dest="action", required=True)
+    export = actions.add_parser("export", help="write the changes since the consumer's last export")
+    export.add_argument("consumer", help="name of the downstream copy, e.g. warehouse")
+    export.add_argument("--out", default=".", help="output directory (default: current)")
+    export.add_argument("--table", action="append", choices=sorted(TABLES), help="default: all")
+    export.add_argument("--full", action="store_true", help="export every row and restart from now")
+    actions.add_parser("status", help="consumers, watermarks and pending changes")
+    actions.add_parser("prune", help="drop change log entries every consumer has exported")
+
+def run(args):
+    if args.action == "export":
+        high, written = export_changes(args.consumer, args.out, args.table, args.full, path=args.db)
+        if not written:
+            print(f"✅ No changes for {args.consumer} up to {high}.")
+        for file_path, lines in written:
+            print(f"✅ {file_path}: {lines:,} changes")
+    elif args.action == "status":
+        print(tabulate(status(args.db), headers=STATUS_HEADERS, tablefmt="grid"))
+    else:
+        print(f"✅ Pruned {prune(args.db):,} change log entries.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Change data capture: delta exports since a watermark")
+    parser.add_argument("--db", default=db.DB_NAME)
+    add_arguments(parser)
+    run(parser.parse_args())
@@ -0,0 +1,95 @@
+
+from datetime import datetime
+
+from db import transaction
+from ids import reserve_ids
+from cache import product_cache
+import ledger
+import locations
+
+OK = "ok"
+NOT_FOUND = "not_found"
+INSUFFICIENT_STOCK = "insufficient_stock"
+INVALID_QUANTITY = "invalid_quantity"
+
+# -------------------- Checkout --------------------
+def checkout(customer_id, basket, allow_partial=False, path=None, location=None):
+    # basket: iterable of (product_id, qty). Everything happens in one
+    # BEGIN IMMEDIATE transaction, so stock read here can't change under us.
+    # By default the order is all-or-nothing; with allow_partial the valid
+    # lines are committed and the rest reported. Stock is taken from
+    # location (default MAIN).
+    with transaction(path, immediate=True, setup=locations.attach) as conn:
+        result = apply_checkout(conn, customer_id, basket, allow_partial, location)
+    product_cache.flush()
+    return result
+
+def apply_checkout(conn, customer_id, basket, allow_partial=False, location=None):
+    # The work of checkout() inside the caller's write transaction. Nothing
+    # is written unless the result says committed.
+    basket = [(pid, qty) for pid, qty in basket]
+    schema = locations.schema_for(conn, location) if location else None
+    date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    lines = []
+    product_ids = sorted({pid for pid, _ in basket})
+    stock = {}
+    if product_ids:
+        marks = ",".join("?" * len(product_ids))
+        for pid, price, qty in conn.execute(
+                f"SELECT product_id, price, quantity FROM products WHERE product_id IN ({marks})",
+                product_ids):
+            stock[pid] = [price, qty]
+        if schema:
+            at_location = dict(conn.execute(f"""SELECT product_id, quantity FROM {schema}.stock_levels
+                                                WHERE location_id=? AND product_id IN ({marks})""",
+                                            [location] + product_ids))
+            for pid in stock:
+                stock[pid][1] = at_location.get(pid, 0)
+
+    # Validate against a running balance so repeated products add up
+    for pid, qty in basket:
+        line = {"product_id": pid, "qty": qty, "sale_id": None, "total": None}
+        if not isinstance(qty, int) or qty <= 0:
+            line["status"] = INVALID_QUANTITY
+        elif pid not in stock:
+            line["status"] = NOT_FOUND
+        elif qty > stock[pid][1]:
+            line["status"] = INSUFFICIENT_STOCK
+            line["stock"] = stock[pid][1]
+        else:
+            stock[pid][1] -= qty
+            line["status"] = OK
+            line["total"] = stock[pid][0] * qty
+        lines.append(line)
+
+    accepted = [line for line in lines if line["status"] == OK]
+    committed = bool(accepted) and (allow_partial or len(accepted) == len(lines))
+    if not committed:
+        return {"committed": False, "lines": lines}
+
+    decrements = {}
+    for line in accepted:
+        decrements[line["product_id"]] = decrements.get(line["product_id"], 0) + line["qty"]
+    if schema:
+        if locations.sell(conn, location, decrements):
+            raise RuntimeError("Stock changed during checkout.")
+    else:
+        product_cache.invalidate(decrements)
+        cur = conn.executemany("UPDATE products SET quantity = quantity - ? "
+                               "WHERE product_id=? AND quantity >= ?",
+                               [(qty, pid, qty) for pid, qty in decrements.items()])
+        if cur.rowcount != len(decrements):
+            # Guard only: the write lock means the checks above still hold
+            raise RuntimeError("Stock changed during checkout.")
+
+    for line, num in zip(accepted, reserve_ids(conn, "SL", len(accepted))):
+        line["sale_id"] = f"SL_{num}"
+    conn.executemany("INSERT INTO sales VALUES(?,?,?,?,?,?)",
+                     [(line["sale_id"], line["product_id"], customer_id,
+                       line["qty"], line["total"], date) for line in accepted])
+    if schema:
+        locations.log_sales(conn, location, accepted)
+    else:
+        ledger.log(conn, [(line["product_id"], ledger.SALE, -line["qty"], line["sale_id"], None)
+                          for line in accepted])
+    return {"committed": True, "lines": lines}
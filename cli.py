@@ -0,0 +1,401 @@
+
+import sys
+import csv
+import getpass
+import json
+import argparse
+from tabulate import tabulate
+
+import db
+import services
+import bulk_import
+import bulk_update
+import batch_reports
+import columnar
+import changes
+import replica
+import migrations
+import analytics
+import reorder
+import ledger
+import server
+import profiling
+import auth
+import locations
+from render import render_table
+from export import export_report, REPORTS
+from search import search
+
+HEADERS = {
+    "supplier": ["Supplier ID", "Name", "Contact", "Address"],
+    "product": ["Product ID", "Name", "Category", "Size", "Qty", "Price", "Supplier ID"],
+    "customer": ["Customer ID", "Name", "Contact"],
+    "sale": ["Sale ID", "Product ID", "Customer ID", "Qty", "Total", "Date"],
+}
+
+# -------------------- Output --------------------
+def write_rows(rows, headers, fmt):
+    # All formats stream; large tables switch to the compact layout
+    if fmt == "csv":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(headers)
+        writer.writerows(rows)
+    elif fmt == "json":
+        for row in rows:
+            print(json.dumps(dict(zip(headers, row))))
+    else:
+        with profiling.timer("render", "write_rows"):
+            count = render_table(rows, headers)
+        if not count:
+            print("No records found.")
+
+def fail(message):
+    print(f"❌ {message}", file=sys.stderr)
+    return 1
+
+# -------------------- Commands --------------------
+def cmd_entity(args):
+    kind = args.kind
+    if args.action == "list":
+        write_rows(services.list_rows(kind), HEADERS[kind], args.format)
+    elif args.action == "get":
+        row = services.get(kind, args.id)
+        if not row:
+            return fail(f"{kind.title()} {args.id} not found.")
+        write_rows([row], HEADERS[kind], args.format)
+    elif args.action == "add":
+        values = {field: getattr(args, field) for field, _, _ in services.FIELDS[kind]}
+        print(services.add(kind, **values))
+    elif args.action == "update":
+        values = {field: getattr(args, field) for field, _, _ in services.FIELDS[kind]}
+        if not services.update(kind, args.id, **values):
+            return fail(f"{kind.title()} {args.id} not found.")
+        print(f"✅ {kind.title()} {args.id} updated.")
+    elif args.action == "delete":
+        if not services.delete(kind, args.id):
+            return fail(f"{kind.title()} {args.id} not found.")
+        print(f"✅ {kind.title()} {args.id} deleted.")
+    return 0
+
+def parse_item(value):
+    product_id, _, qty = value.rpartition(":")
+    if not product_id or not qty.isdigit():
+        raise argparse.ArgumentTypeError(f"expected PRODUCT_ID:QTY, got {value!r}")
+    return product_id, int(qty)
+
+def cmd_sale_add(args):
+    result = services.record_sale(args.customer, args.item, args.partial, args.location)
+    for line in result["lines"]:
+        print(f"{line['product_id']}\t{line['qty']}\t{line['status']}\t{line['sale_id'] or '-'}")
+    return 0 if result["committed"] else 1
+
+def cmd_report(args):
+    name = f"{args.name}_report"
+    if args.export:
+        file_path, count = export_report(name, args.since, args.until, gzip_output=args.gzip)
+        print(f"✅ Exported {count} rows to {file_path}")
+    else:
+        write_rows(services.report_rows(name, args.since, args.until),
+                   services.report_headers(name), args.format)
+    return 0
+
+def cmd_analytics(args):
+    if args.name == "refresh":
+        print(f"✅ Folded {analytics.refresh_summary()} new sales into the daily summary.")
+        return 0
+    rows = analytics.report(args.name, args.since, args.until, args.top, args.summary)
+    write_rows(rows, analytics.HEADERS[args.name], args.format)
+    return 0
+
+def cmd_reorder(args):
+    rows = reorder.alerts(args.lead_time, args.cover, args.min_stock)
+    if args.orders:
+        write_rows(reorder.order_rows(reorder.purchase_orders(rows)), reorder.ORDER_HEADERS, args.format)
+    else:
+        write_rows(rows, reorder.ALERT_HEADERS, args.format)
+    return 0
+
+def cmd_stock(args):
+    if args.action == "receive" and args.location:
+        stock = locations.receive(args.product_id, args.location, args.qty, args.ref, args.note)
+        print(f"✅ {args.product_id} stock at {args.location} is now {stock}.")
+    elif args.action == "receive":
+        stock = services.receive_stock(args.product_id, args.qty, args.ref, args.note)
+        print(f"✅ {args.product_id} stock is now {stock}.")
+    elif args.action == "return":
+        print(f"✅ Return recorded, stock is now {services.return_sale(args.sale_id, args.qty, args.note)}.")
+    elif args.action == "adjust" and args.location:
+        stock = locations.adjust(args.product_id, args.location, args.count, args.note)
+        print(f"✅ {args.product_id} stock at {args.location} is now {stock}.")
+    elif args.action == "adjust":
+        stock = services.adjust_stock(args.product_id, args.count, args.note)
+        print(f"✅ {args.product_id} stock is now {stock}.")
+    elif args.action == "transfer":
+        reference, left, arrived = locations.transfer(args.product_id, args.source, args.destination,
+                                                      args.qty, args.note)
+        print(f"✅ {reference}: {args.source} has {left}, {args.destination} has {arrived}.")
+    elif args.action == "history":
+        write_rows(locations.history(args.product_id, args.limit), locations.MOVEMENT_HEADERS, args.format)
+    elif args.action == "snapshot":
+        snap_id, folded = ledger.snapshot()
+        print(f"✅ Snapshot {snap_id} folded in {folded} movements.")
+    elif args.action == "reconcile":
+        rows = ledger.reconcile(args.fix)
+        write_rows(rows, ledger.MISMATCH_HEADERS, args.format)
+        return 1 if rows and not args.fix else 0
+    return 0
+
+def cmd_location(args):
+    if args.action == "list":
+        write_rows(locations.list_locations(), locations.LIST_HEADERS, args.format)
+    elif args.action == "add":
+        location_id, db_file = locations.add_location(args.location_id, args.name, args.shard)
+        print(f"✅ Location {location_id} added" + (f", stored in {db_file}." if db_file else "."))
+    elif args.product is not None:
+        write_rows(locations.product_totals(args.product or None), locations.PRODUCT_HEADERS, args.format)
+    else:
+        write_rows(locations.location_totals(), locations.LOCATION_HEADERS, args.format)
+    return 0
+
+def cmd_user(args):
+    if args.action == "list":
+        write_rows(services.list_users(), ["User ID", "Username", "Role"], args.format)
+        return 0
+    password = getpass.getpass(f"Password for {args.username}: ")
+    if not password or password != getpass.getpass("Repeat password: "):
+        return fail("Passwords are empty or don't match.")
+    if args.action == "add":
+        print(f"✅ User {args.username} added with ID {services.add_user(args.username, password, args.role)}.")
+    elif not auth.set_password(args.username, password):
+        return fail(f"User {args.username} not found.")
+    else:
+        print(f"✅ Password for {args.username} changed.")
+    return 0
+
+def cmd_search(args):
+    rows = [row[:4] for row in search(args.text, args.kind and [args.kind], args.limit)]
+    write_rows(rows, ["Type", "ID", "Name", "Details"], args.format)
+    return 0
+
+def cmd_init(args):
+    services.init_db()
+    print(f"✅ Database ready: {db.DB_NAME}")
+    return 0
+
+def cmd_migrate(args):
+    migrations.migrate(verbose=True)
+    failures = migrations.check_plans()
+    for desc, index, plan in failures:
+        print(f"❌ {desc}: expected {index}, got {plan}")
+    return 1 if failures else 0
+
+def cmd_serve(args):
+    server.run(args)
+    return 0
+
+def cmd_report_all(args):
+    batch_reports.run(args)
+    return 0
+
+def cmd_extract(args):
+    if columnar.pa is None:
+        return fail("Columnar extracts need pyarrow: pip install pyarrow")
+    columnar.run(args)
+    return 0
+
+def cmd_changes(args):
+    args.db = db.DB_NAME
+    changes.run(args)
+    return 0
+
+def cmd_replica(args):
+    replica.run(args)
+    return 0
+
+def cmd_import(args):
+    args.db = db.DB_NAME
+    bulk_import.run(args)
+    return 0
+
+def cmd_bulk(args):
+    args.db = db.DB_NAME
+    bulk_update.run(args)
+    return 0
+
+# -------------------- Parser --------------------
+def build_parser():
+    parser = argparse.ArgumentParser(prog="inventory", description="Inventory management command line")
+    parser.add_argument("--db", default=db.DB_NAME, help="database file (default: %(default)s)")
+    parser.add_argument("--profile", action="store_true", help="print SQL and render timings to stderr")
+    parser.add_argument("--slow-ms", type=float, help="log statements slower than this to slow_queries.log")
+    parser.add_argument("--metrics", help="write Prometheus text metrics to this file on exit")
+    parser.add_argument("--replica", action="store_true",
+                        help="read reports and exports from <db>_replica.db (created if missing)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    fmt = argparse.ArgumentParser(add_help=False)
+    fmt.add_argument("--format", choices=["table", "csv", "json"], default="table")
+
+    for kind in services.FIELDS:
+        entity = sub.add_parser(kind, help=f"manage {kind}s")
+        actions = entity.add_subparsers(dest="action", required=True)
+        listing = actions.add_parser("list", parents=[fmt])
+        get = actions.add_parser("get", parents=[fmt])
+        get.add_argument("id")
+        add = actions.add_parser("add")
+        if kind == "sale":
+            # A sale is a whole basket recorded through checkout
+            add.add_argument("--customer", required=True)
+            add.add_argument("--item", type=parse_item, action="append", required=True,
+                             metavar="PRODUCT_ID:QTY")
+            add.add_argument("--partial", action="store_true", help="commit the lines that fit the stock")
+            add.add_argument("--location", help="sell from this location's stock (default: MAIN)")
+        else:
+            for field, convert, required in services.FIELDS[kind]:
+                add.add_argument(f"--{field.replace('_', '-')}", dest=field, type=convert, required=required)
+        update = actions.add_parser("update")
+        update.add_argument("id")
+        for field, convert, _ in services.FIELDS[kind]:
+            update.add_argument(f"--{field.replace('_', '-')}", dest=field, type=convert)
+        delete = actions.add_parser("delete")
+        delete.add_argument("id")
+        for action in (listing, get, add, update, delete):
+            action.set_defaults(func=cmd_entity, kind=kind)
+        if kind == "sale":
+            add.set_defaults(func=cmd_sale_add)
+
+    report = sub.add_parser("report", parents=[fmt], help="print or export a report")
+    report.add_argument("name", choices=[name[:-len("_report")] for name in REPORTS])
+    report.add_argument("--since", help="YYYY-MM-DD (sales only)")
+    report.add_argument("--until", help="YYYY-MM-DD, inclusive (sales only)")
+    report.add_argument("--export", action="store_true", help="write a timestamped CSV file")
+    report.add_argument("--gzip", action="store_true", help="compress the exported file")
+    report.set_defaults(func=cmd_report)
+
+    report_all = sub.add_parser("report-all", help="write every report to its own file on a process pool")
+    batch_reports.add_arguments(report_all)
+    report_all.set_defaults(func=cmd_report_all)
+
+    extract = sub.add_parser("extract", help="export sales, products and customers to Parquet/Arrow files")
+    columnar.add_arguments(extract)
+    extract.set_defaults(func=cmd_extract)
+
+    cdc = sub.add_parser("changes", help="delta exports of inserted, updated and deleted rows")
+    changes.add_arguments(cdc)
+    cdc.set_defaults(func=cmd_changes)
+
+    replica_cmd = sub.add_parser("replica", help="maintain the read-only replica used with --replica")
+    replica.add_arguments(replica_cmd)
+    replica_cmd.set_defaults(func=cmd_replica)
+
+    stats = sub.add_parser("analytics", parents=[fmt], help="aggregated sales reports")
+    stats.add_argument("name", choices=list(analytics.HEADERS) + ["refresh"])
+    stats.add_argument("--since", help="YYYY-MM-DD")
+    stats.add_argument("--until", help="YYYY-MM-DD, inclusive")
+    stats.add_argument("--top", type=int, help="limit to the top N (per category for 'top')")
+    stats.add_argument("--summary", action="store_true",
+                       help="read the incrementally refreshed daily summary instead of all sales")
+    stats.set_defaults(func=cmd_analytics)
+
+    reorder_cmd = sub.add_parser("reorder", parents=[fmt], help="low-stock alerts and purchase orders")
+    reorder_cmd.add_argument("--lead-time", type=int, default=reorder.LEAD_TIME_DAYS,
+                             help="alert when stock lasts fewer days than this (default: %(default)s)")
+    reorder_cmd.add_argument("--cover", type=int, default=reorder.COVER_DAYS,
+                             help="days of sales an order should cover (default: %(default)s)")
+    reorder_cmd.add_argument("--min-stock", type=int, default=reorder.MIN_STOCK,
+                             help="always alert at or below this quantity (default: %(default)s)")
+    reorder_cmd.add_argument("--orders", action="store_true", help="print purchase orders grouped by supplier")
+    reorder_cmd.set_defaults(func=cmd_reorder)
+
+    stock = sub.add_parser("stock", help="stock movements: receipts, returns, adjustments, reconciliation")
+    moves = stock.add_subparsers(dest="action", required=True)
+    receive = moves.add_parser("receive", help="record a purchase receipt")
+    receive.add_argument("product_id")
+    receive.add_argument("qty", type=int)
+    receive.add_argument("--ref", help="delivery or purchase order reference")
+    returned = moves.add_parser("return", help="put returned units of a sale back in stock")
+    returned.add_argument("sale_id")
+    returned.add_argument("--qty", type=int, help="default: everything still out")
+    adjust = moves.add_parser("adjust", help="set stock to a counted quantity")
+    adjust.add_argument("product_id")
+    adjust.add_argument("count", type=int)
+    for action in (receive, adjust):
+        action.add_argument("--location", help="default: MAIN")
+    transfer = moves.add_parser("transfer", help="move units between locations")
+    transfer.add_argument("product_id")
+    transfer.add_argument("qty", type=int)
+    transfer.add_argument("--from", dest="source", required=True)
+    transfer.add_argument("--to", dest="destination", required=True)
+    for action in (receive, returned, adjust, transfer):
+        action.add_argument("--note")
+    history = moves.add_parser("history", parents=[fmt])
+    history.add_argument("product_id")
+    history.add_argument("--limit", type=int, default=50)
+    moves.add_parser("snapshot", help="fold new movements into a stock snapshot")
+    reconcile = moves.add_parser("reconcile", parents=[fmt], help="compare stock with the ledger")
+    reconcile.add_argument("--fix", action="store_true", help="reset mismatched stock to the ledger balance")
+    stock.set_defaults(func=cmd_stock)
+
+    location = sub.add_parser("location", help="stock locations and per-location totals")
+    location_actions = location.add_subparsers(dest="action", required=True)
+    location_actions.add_parser("list", parents=[fmt])
+    add_location = location_actions.add_parser("add", help="create a warehouse or store")
+    add_location.add_argument("location_id")
+    add_location.add_argument("name")
+    add_location.add_argument("--shard", action="store_true", help="keep its stock in a separate database file")
+    location_report = location_actions.add_parser("report", parents=[fmt],
+                                                  help="units and value per location, or per product")
+    location_report.add_argument("--product", nargs="?", const="", help="break down one product (or all)")
+    location.set_defaults(func=cmd_location)
+
+    user = sub.add_parser("user", help="manage login accounts")
+    user_actions = user.add_subparsers(dest="action", required=True)
+    user_actions.add_parser("list", parents=[fmt])
+    add_user = user_actions.add_parser("add", help="create a user (prompts for the password)")
+    add_user.add_argument("username")
+    add_user.add_argument("--role", choices=["admin", "salesperson"], default="salesperson")
+    passwd = user_actions.add_parser("passwd", help="change a password (prompts for it)")
+    passwd.add_argument("username")
+    user.set_defaults(func=cmd_user)
+
+    search_cmd = sub.add_parser("search", parents=[fmt], help="full-text search")
+    search_cmd.add_argument("text")
+    search_cmd.add_argument("--kind", choices=["supplier", "product", "customer"])
+    search_cmd.add_argument("--limit", type=int, default=20)
+    search_cmd.set_defaults(func=cmd_search)
+
+    sub.add_parser("init", help="create the schema and apply migrations").set_defaults(func=cmd_init)
+    sub.add_parser("migrate", help="apply migrations and check query plans").set_defaults(func=cmd_migrate)
+
+    serve = sub.add_parser("serve", help="run the HTTP/JSON service")
+    server.add_arguments(serve)
+    serve.set_defaults(func=cmd_serve)
+
+    imp = sub.add_parser("import", help="bulk load a CSV/JSONL file")
+    bulk_import.add_arguments(imp)
+    imp.set_defaults(func=cmd_import)
+
+    bulk = sub.add_parser("bulk", help="change prices/stock for many products (preview unless --apply)")
+    bulk_update.add_arguments(bulk)
+    bulk.set_defaults(func=cmd_bulk)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    db.DB_NAME = args.db
+    if args.profile or args.slow_ms or args.metrics:
+        profiling.configure(slow_ms=args.slow_ms, metrics_file=args.metrics)
+    try:
+        if args.replica:
+            replica.use()
+        return args.func(args)
+    except ValueError as e:
+        return fail(str(e))
+    finally:
+        if args.profile:
+            print(tabulate(profiling.summary(), headers=profiling.SUMMARY_HEADERS, tablefmt="grid"),
+                  file=sys.stderr)
+        profiling.write_metrics()
+
+if __name__ == "__main__":
+    sys.exit(main())
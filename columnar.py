@@ -0,0 +1,131 @@
+
+import os
+import time
+import argparse
+from datetime import date, timedelta
+
+import db
+from db import reading
+from export import add_date_filter
+from batch_reports import date_slices
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: pip install pyarrow
+    pa = pq = None
+
+BATCH_SIZE = 50000
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+COMPRESSION = "zstd"
+
+# table -> (SELECT producing typed columns, [(column, arrow type name)])
+# Dates leave SQLite as epoch seconds, so no per-row parsing in Python.
+TABLES = {
+    "sales": ("""SELECT sale_id, product_id, customer_id, quantity, total,
+                        CAST(strftime('%s', date) AS INTEGER) AS date FROM sales""",
+              [("sale_id", "string"), ("product_id", "string"), ("customer_id", "string"),
+               ("quantity", "int64"), ("total", "float64"), ("date", "timestamp")]),
+    "products": ("SELECT product_id, name, category, size, quantity, price, supplier_id FROM products",
+                 [("product_id", "string"), ("name", "string"), ("category", "string"), ("size", "string"),
+                  ("quantity", "int64"), ("price", "float64"), ("supplier_id", "string")]),
+    "customers": ("SELECT customer_id, name, contact FROM customers",
+                  [("customer_id", "string"), ("name", "string"), ("contact", "string")]),
+}
+
+# -------------------- Arrow Helpers --------------------
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Columnar export needs pyarrow: pip install pyarrow")
+
+def arrow_type(name):
+    return pa.timestamp("s") if name == "timestamp" else getattr(pa, name)()
+
+def schema_for(table):
+    return pa.schema([(column, arrow_type(kind)) for column, kind in TABLES[table][1]])
+
+def open_writer(file_path, schema, fmt):
+    if fmt == "parquet":
+        return pq.ParquetWriter(file_path, schema, compression=COMPRESSION)
+    return pa.ipc.new_file(file_path, schema, options=pa.ipc.IpcWriteOptions(compression=COMPRESSION))
+
+def write_query(conn, file_path, schema, sql, params=(), fmt="parquet", batch_size=BATCH_SIZE):
+    # Streams the query into one file, batch_size rows per record batch.
+    # Written under a temporary name and renamed, so readers never see a
+    # half-written file.
+    tmp = file_path + ".tmp"
+    count = 0
+    cur = conn.execute(sql, params)
+    writer = open_writer(tmp, schema, fmt)
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            columns = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+            count += len(rows)
+    finally:
+        writer.close()
+    os.replace(tmp, file_path)
+    return count
+
+# -------------------- Export --------------------
+def export(out_dir, fmt="parquet", since=None, until=None, batch_size=BATCH_SIZE, progress=None, path=None):
+    # products.<ext>, customers.<ext> and sales/month=YYYY-MM/part-0.<ext>
+    # (Hive-style partitions that pyarrow, DuckDB and Spark read as one
+    # dataset). Returns [(file_path, rows)].
+    require_pyarrow()
+    ext = FORMATS[fmt]
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    with reading(path) as conn:
+        for table in ("products", "customers"):
+            file_path = os.path.join(out_dir, table + ext)
+            written.append((file_path, write_query(conn, file_path, schema_for(table), TABLES[table][0],
+                                                   fmt=fmt, batch_size=batch_size)))
+            if progress:
+                progress(*written[-1])
+
+        sql, params = add_date_filter("SELECT date FROM sales", "date", since, until)
+        first = conn.execute(f"SELECT MIN(date) FROM ({sql})", params).fetchone()[0]
+        last = conn.execute(f"SELECT MAX(date) FROM ({sql})", params).fetchone()[0]
+        if not first:
+            return written
+        schema = schema_for("sales")
+        for label, start, end in date_slices(date.fromisoformat(first[:10]), date.fromisoformat(last[:10]),
+                                             "month"):
+            # Each month is an index range scan on the text sales.date
+            month_sql = TABLES["sales"][0] + " WHERE sales.date >= ? AND sales.date < ? ORDER BY sales.date"
+            month_params = (start, (date.fromisoformat(end) + timedelta(days=1)).isoformat())
+            partition = os.path.join(out_dir, "sales", f"month={label}")
+            os.makedirs(partition, exist_ok=True)
+            file_path = os.path.join(partition, "part-0" + ext)
+            written.append((file_path, write_query(conn, file_path, schema, month_sql, month_params,
+                                                   fmt, batch_size)))
+            if progress:
+                progress(*written[-1])
+    return written
+
+# -------------------- Command Line --------------------
+def add_arguments(parser):
+    parser.add_argument("--out", default="extract", help="output directory (default: %(default)s)")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--since", help="YYYY-MM-DD (sales only)")
+    parser.add_argument("--until", help="YYYY-MM-DD, inclusive (sales only)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+def run(args):
+    start = time.perf_counter()
+    written = export(args.out, args.format, args.since, args.until, args.batch_size,
+                     progress=lambda file_path, rows: print(f"   {file_path}: {rows:,} rows"),
+                     path=db.REPORT_DB or args.db)
+    size = sum(os.path.getsize(file_path) for file_path, _ in written)
+    print(f"✅ {len(written)} files, {sum(rows for _, rows in written):,} rows, {size / 1048576:.1f} MiB "
+          f"in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export sales, products and customers to Parquet/Arrow")
+    parser.add_argument("--db", default=db.DB_NAME)
+    add_arguments(parser)
+    run(parser.parse_args())
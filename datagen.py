@@ -0,0 +1,134 @@
+
+import os
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+import ledger
+import analytics
+from db import transaction
+from ids import reserve_ids
+from services import init_db
+from bulk_import import drop_indexes, restore_indexes
+
+BATCH_SIZE = 50000
+
+# name -> (suppliers, products, customers, sales)
+SCALES = {
+    "small": (100, 1000, 1000, 10000),
+    "medium": (1000, 100000, 50000, 1000000),
+    "large": (5000, 100000, 200000, 10000000),
+}
+
+CATEGORIES = ["Fruits", "Vegetables", "Dairy", "Bakery", "Beverages", "Snacks", "Frozen",
+              "Household", "Personal Care", "Stationery", "Electronics", "Toys"]
+ADJECTIVES = ["Fresh", "Organic", "Classic", "Premium", "Golden", "Crispy", "Spicy", "Sweet",
+              "Green", "Royal", "Family", "Mini", "Extra", "Natural", "Wild", "Smart"]
+NOUNS = ["Apple", "Mango", "Juice", "Bread", "Cheese", "Butter", "Chips", "Cookies", "Rice",
+         "Soap", "Shampoo", "Notebook", "Pen", "Battery", "Charger", "Tea", "Coffee", "Yogurt"]
+SIZES = ["100 gm", "250 gm", "500 gm", "1 kg", "2 kg", "500 ml", "1 l", "1 pc", "6 pcs", "12 pcs"]
+CITIES = ["Chennai", "Mumbai", "Delhi", "Pune", "Kochi", "Hyderabad", "Kolkata", "Jaipur"]
+FIRST = ["Arun", "Priya", "Rahul", "Fatima", "John", "Meera", "Vikram", "Anita", "Zakir", "Divya"]
+LAST = ["Kumar", "Sharma", "Khan", "Iyer", "Das", "Patel", "Nair", "Singh", "Reddy", "Joseph"]
+
+# -------------------- Row Generators --------------------
+def phone(rng):
+    return f"9{rng.randrange(10 ** 9):09d}"
+
+def supplier_rows(rng, count):
+    for i in range(count):
+        yield (f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} Traders {i + 1}", phone(rng),
+               f"{rng.randint(1, 999)} Market Road, {rng.choice(CITIES)}")
+
+def product_rows(rng, count, suppliers):
+    for _ in range(count):
+        yield (f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}", rng.choice(CATEGORIES), rng.choice(SIZES),
+               rng.randint(0, 5000), round(rng.uniform(5, 500), 2), f"SP_{rng.randint(1, suppliers)}")
+
+def customer_rows(rng, count):
+    for _ in range(count):
+        yield (f"{rng.choice(FIRST)} {rng.choice(LAST)}", phone(rng))
+
+def sale_rows(rng, count, products, customers, prices, days):
+    # Chronological dates spread evenly over the last `days`; a few
+    # products account for most of the sales.
+    start = datetime.now() - timedelta(days=days)
+    step = days * 86400 / max(count, 1)
+    for i in range(count):
+        product = int(products * rng.random() ** 3) + 1
+        qty = rng.randint(1, 5)
+        date = start + timedelta(seconds=(i + rng.random()) * step)
+        yield (f"PR_{product}", f"CU_{rng.randint(1, customers)}", qty,
+               round(prices[product - 1] * qty, 2), date.strftime("%Y-%m-%d %H:%M:%S"))
+
+# -------------------- Loader --------------------
+def insert(table, prefix, rows, width, batch_size=BATCH_SIZE, progress=None, path=None):
+    sql = f"INSERT INTO {table} VALUES({','.join('?' * width)})"
+    saved = drop_indexes(table, path)
+    count = 0
+    try:
+        while True:
+            batch = [row for _, row in zip(range(batch_size), rows)]
+            if not batch:
+                break
+            with transaction(path, immediate=True) as conn:
+                ids = reserve_ids(conn, prefix, len(batch))
+                batch = [(f"{prefix}_{num}", *row) for num, row in zip(ids, batch)]
+                conn.executemany(sql, batch)
+                if table == "products":
+                    ledger.log(conn, [(row[0], ledger.OPENING, row[4], None, "generated") for row in batch])
+            count += len(batch)
+            if progress:
+                progress(table, count)
+    finally:
+        restore_indexes(saved, table, path)
+    return count
+
+def generate(path, suppliers, products, customers, sales, days=365, seed=1, progress=None):
+    # Builds a fresh database at path. Products get opening stock movements;
+    # sales are history and don't touch stock, like an imported file.
+    if os.path.exists(path):
+        raise ValueError(f"{path} already exists")
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    init_db(path)
+    insert("suppliers", "SP", supplier_rows(rng, suppliers), 4, progress=progress, path=path)
+    # Prices are drawn up front so sale totals can be computed without a lookup
+    catalog = list(product_rows(rng, products, suppliers))
+    insert("products", "PR", iter(catalog), 7, progress=progress, path=path)
+    prices = [row[4] for row in catalog]
+    del catalog
+    insert("customers", "CU", customer_rows(rng, customers), 3, progress=progress, path=path)
+    insert("sales", "SL", sale_rows(rng, sales, products, customers, prices, days), 6,
+           progress=progress, path=path)
+    analytics.refresh_summary(path)
+    with transaction(path) as conn:
+        conn.execute("ANALYZE")
+    return time.perf_counter() - start
+
+def print_progress(table, count):
+    print(f"\r   {table:<10}{count:>14,} rows...", end="", flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic inventory database")
+    parser.add_argument("--db", default="bench_inventory.db")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--suppliers", type=int)
+    parser.add_argument("--products", type=int)
+    parser.add_argument("--customers", type=int)
+    parser.add_argument("--sales", type=int)
+    parser.add_argument("--days", type=int, default=365, help="spread sales over this many days")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    counts = [given if given is not None else default
+              for given, default in zip((args.suppliers, args.products, args.customers, args.sales),
+                                        SCALES[args.scale])]
+    try:
+        seconds = generate(args.db, *counts, args.days, args.seed, print_progress)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    print()
+    names = ["suppliers", "products", "customers", "sales"]
+    print(f"✅ Generated {args.db} with {', '.join(f'{n:,} {name}' for n, name in zip(counts, names))} "
+          f"in {seconds:.1f}s")
@@ -0,0 +1,156 @@
+
+import os
+import sqlite3
+import threading
+import queue
+import atexit
+from contextlib import contextmanager
+
+import profiling
+
+DB_NAME = "inventory.db"
+POOL_SIZE = 8
+BUSY_TIMEOUT = 30  # seconds to wait on a locked database
+# Read-only replica that reports and exports read from (see replica.py)
+REPORT_DB = os.environ.get("INVENTORY_REPLICA")
+
+# Applied once per physical connection, not per operation.
+PRAGMAS = [
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),   # safe with WAL, avoids an fsync per commit
+    ("cache_size", "-65536"),    # 64 MiB page cache (negative = KiB)
+    ("mmap_size", "268435456"),  # 256 MiB memory-mapped reads
+    ("temp_store", "MEMORY"),
+]
+
+# -------------------- Connection Pool --------------------
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE, read_only=False):
+        self.path = path
+        self.size = size
+        self.read_only = read_only
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _connect(self):
+        if self.read_only:
+            return connect_read_only(self.path)
+        factory = profiling.ProfiledConnection if profiling.ENABLED else sqlite3.Connection
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False, factory=factory)
+        for name, value in PRAGMAS:
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def acquire(self, timeout=None):
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed.")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self._created < self.size
+            if grow:
+                self._created += 1
+        if grow:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a pooled connection.")
+
+    def release(self, conn):
+        # Never hand a connection with an open transaction to the next caller
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def connect_read_only(path=None):
+    # A private connection that can't write, e.g. for worker processes.
+    # In WAL mode it reads a consistent snapshot without blocking writers.
+    factory = profiling.ProfiledConnection if profiling.ENABLED else sqlite3.Connection
+    conn = sqlite3.connect(f"file:{path or DB_NAME}?mode=ro", uri=True, timeout=BUSY_TIMEOUT,
+                           check_same_thread=False, factory=factory)
+    for name, value in PRAGMAS:
+        if name not in ("journal_mode", "synchronous"):
+            conn.execute(f"PRAGMA {name}={value}")
+    conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path=None, read_only=False):
+    path = path or DB_NAME
+    key = (path, read_only)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(path, read_only=read_only)
+    return pool
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+atexit.register(close_pools)
+
+# -------------------- Context Managers --------------------
+@contextmanager
+def connection(path=None, read_only=False):
+    pool = get_pool(path, read_only)
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+@contextmanager
+def reading(path=None):
+    # For reports and exports: the replica when one is in use, so long
+    # reads stay off the live database. The replica is opened read-only,
+    # so nothing but refresh() ever writes it.
+    path = path or REPORT_DB
+    with connection(path, read_only=bool(REPORT_DB) and path == REPORT_DB) as conn:
+        yield conn
+
+@contextmanager
+def transaction(path=None, immediate=False, setup=None):
+    # BEGIN IMMEDIATE takes the write lock up front so read-then-write
+    # sequences can't be interleaved with another writer. setup(conn) runs
+    # before BEGIN, for statements such as ATTACH that can't run inside one.
+    with connection(path) as conn:
+        if setup:
+            setup(conn)
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
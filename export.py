@@ -0,0 +1,89 @@
+
+import csv
+import gzip
+from datetime import datetime, timedelta
+
+from db import reading
+
+BATCH_SIZE = 5000
+
+# name -> (query, headers, date column used for since/until filters)
+REPORTS = {
+    "stock_report": ("SELECT product_id, name, quantity FROM products",
+                     ["Product ID", "Name", "Qty"], None),
+    "sales_report": ("SELECT sale_id, product_id, customer_id, quantity, total, date FROM sales",
+                     ["Sale ID", "Product", "Customer", "Qty", "Total", "Date"], "date"),
+    "supplier_report": ("""SELECT s.supplier_id, s.name, IFNULL(p.name, '-') AS product_name,
+                                  IFNULL(p.quantity, 0) AS qty
+                           FROM suppliers s
+                           LEFT JOIN products p ON s.supplier_id = p.supplier_id
+                           ORDER BY s.name""",
+                        ["Supplier ID", "Supplier Name", "Product", "Qty"], None),
+}
+
+# -------------------- Helpers --------------------
+def add_date_filter(sql, column, since=None, until=None):
+    # Dates are stored as 'YYYY-MM-DD HH:MM:SS' text, so plain string
+    # comparison is chronological. A bare 'YYYY-MM-DD' until covers that day.
+    clauses, params = [], []
+    if since:
+        clauses.append(f"{column} >= ?")
+        params.append(since)
+    if until and len(until) == 10:
+        next_day = datetime.strptime(until, "%Y-%m-%d") + timedelta(days=1)
+        clauses.append(f"{column} < ?")
+        params.append(next_day.strftime("%Y-%m-%d"))
+    elif until:
+        clauses.append(f"{column} <= ?")
+        params.append(until)
+    if clauses:
+        sql = f"SELECT * FROM ({sql}) WHERE " + " AND ".join(clauses)
+    return sql, params
+
+def output_path(filename, gzip_output=False):
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{filename}_{ts}.csv" + (".gz" if gzip_output else "")
+
+def print_progress(count):
+    print(f"\r   {count:,} rows written...", end="", flush=True)
+
+# -------------------- Streaming Export --------------------
+def stream_to_csv(file_path, headers, sql, params=(), batch_size=BATCH_SIZE,
+                  progress=None, path=None):
+    # Rows go from the cursor to the writer in fetchmany batches, so memory
+    # use is bounded by batch_size regardless of table size.
+    with reading(path) as conn:
+        return write_csv(conn, file_path, headers, sql, params, batch_size, progress)
+
+def write_csv(conn, file_path, headers, sql, params=(), batch_size=BATCH_SIZE, progress=None):
+    opener = gzip.open if file_path.endswith(".gz") else open
+    count = 0
+    with opener(file_path, "wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            writer.writerows(rows)
+            count += len(rows)
+            if progress:
+                progress(count)
+    return count
+
+def report_query(name, since=None, until=None):
+    sql, headers, date_col = REPORTS[name]
+    params = []
+    if date_col:
+        sql, params = add_date_filter(sql, date_col, since, until)
+    elif since or until:
+        raise ValueError(f"{name} has no date column to filter on.")
+    return sql, params, headers
+
+def export_report(name, since=None, until=None, gzip_output=False, batch_size=BATCH_SIZE,
+                  progress=None, path=None):
+    sql, params, headers = report_query(name, since, until)
+    file_path = output_path(name, gzip_output)
+    count = stream_to_csv(file_path, headers, sql, params, batch_size, progress, path)
+    return file_path, count
@@ -0,0 +1,35 @@
+
+# prefix -> (table, id column)
+SEQUENCES = {
+    "U": ("users", "user_id"),
+    "SP": ("suppliers", "supplier_id"),
+    "PR": ("products", "product_id"),
+    "CU": ("customers", "customer_id"),
+    "SL": ("sales", "sale_id"),
+}
+
+# -------------------- Sequence Table --------------------
+def ensure_sequences(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS id_sequences(
+                    prefix TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL)""")
+    for prefix, (table, col) in SEQUENCES.items():
+        if conn.execute("SELECT 1 FROM id_sequences WHERE prefix=?", (prefix,)).fetchone():
+            continue
+        # Seed from the highest numeric suffix already in use
+        row = conn.execute(f"SELECT MAX(CAST(substr({col}, instr({col}, '_') + 1) AS INTEGER)) "
+                           f"FROM {table}").fetchone()
+        conn.execute("INSERT INTO id_sequences VALUES(?,?)", (prefix, row[0] or 0))
+
+def reserve_ids(conn, prefix, count=1):
+    # Runs inside the caller's transaction: the UPDATE takes the write lock,
+    # so the range is ours until commit and is rolled back with the insert.
+    cur = conn.execute("UPDATE id_sequences SET value = value + ? WHERE prefix=?", (count, prefix))
+    if cur.rowcount != 1:
+        raise KeyError(f"Unknown ID sequence: {prefix}")
+    last = conn.execute("SELECT value FROM id_sequences WHERE prefix=?", (prefix,)).fetchone()[0]
+    return range(last - count + 1, last + 1)
+
+def next_id(conn, prefix):
+    return f"{prefix}_{reserve_ids(conn, prefix)[0]}"
+
@@ -1,30 +1,73 @@
 
-import sqlite3
 import os
 import getpass
 from datetime import datetime
 from tabulate import tabulate
 import csv
 
-DB_NAME = "inventory.db"
+from export import export_report, output_path, print_progress, stream_to_csv
+from paging import Pager
+from search import search, search_table
+import services
+import profiling
+from render import render_table
+import analytics
+import reorder
+import ledger
+import locations
+import bulk_update
+from services import init_db
+from cache import product_cache
 
 # -------------------- Helpers --------------------
 def pause():
     input("\nPress Enter to continue...")
 
 def clear_screen():
-    os.system("cls" if os.name == "nt" else "clear")
-
-def print_table(data, headers):
-    if data:
-        print(tabulate(data, headers=headers, tablefmt="grid"))
+    # ANSI clear + home instead of forking a shell for every redraw
+    if os.name == "nt":
+        os.system("cls")
     else:
+        print("\033[2J\033[H", end="", flush=True)
+
+def print_table(data, headers, widths=None):
+    # data can be a list or a row generator; big results are streamed
+    with profiling.timer("render", "print_table"):
+        count = render_table(data, headers, widths=widths)
+    if not count:
         print("\nNo records found.\n")
 
 def print_menu(title, options):
     table_data = [[i, opt] for i, opt in enumerate(options)]
     print("\n" + title)
-    print(tabulate(table_data, headers=["Option", "Description"], tablefmt="grid"))
+    with profiling.timer("render", "print_menu"):
+        print(tabulate(table_data, headers=["Option", "Description"], tablefmt="grid"))
+
+def browse(table, columns, key, headers):
+    # One page is fetched and rendered at a time
+    pager = Pager(table, columns, key)
+    pager.first()
+    while True:
+        print_table(pager.page(), headers)
+        if not pager.has_prev and not pager.has_next:
+            pause()
+            return
+        print("[n]ext  [p]rev  [f]irst  [l]ast  [j]ump to ID  [s]ize  [q]uit")
+        ch = input("Enter choice: ").strip().lower()
+        if ch == "q": return
+        elif ch == "n" or ch == "": pager.next()
+        elif ch == "p": pager.prev()
+        elif ch == "f": pager.first()
+        elif ch == "l": pager.last()
+        elif ch == "j":
+            if pager.jump(get_nonempty_input("ID: ")) is None:
+                print("❌ ID not found.")
+                pause()
+        elif ch == "s":
+            size = input(f"Page size (current {pager.page_size}): ").strip()
+            if size.isdigit() and int(size) > 0:
+                pager.resize(int(size))
+        clear_screen()
 
 def get_nonempty_input(prompt):
     while True:
@@ -34,89 +77,35 @@ def get_nonempty_input(prompt):
         else:
             print("❌ Input cannot be blank. Try again.")
 
-def generate_id(table, prefix, col):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    try:
-        cur.execute(f"SELECT {col} FROM {table} ORDER BY ROWID DESC LIMIT 1")
-        last = cur.fetchone()
-    except sqlite3.OperationalError:
-        last = None
-    conn.close()
-    if last and last[0]:
+def get_date_input(prompt):
+    # YYYY-MM-DD or blank (None)
+    while True:
+        value = input(prompt).strip()
+        if not value:
+            return None
         try:
-            num = int(last[0].split("_")[1]) + 1
-        except:
-            num = 1
-    else:
-        num = 1
-    return f"{prefix}_{num}"
+            datetime.strptime(value, "%Y-%m-%d")
+            return value
+        except ValueError:
+            print("❌ Use a real date as YYYY-MM-DD. Try again.")
 
 def export_to_csv(filename, headers, rows=None):
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
+    file_path = output_path(filename)
     if rows is None:
-        cur.execute(f"SELECT * FROM {filename}")
-        rows = cur.fetchall()
-    conn.close()
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_path = f"{filename}_{ts}.csv"
-    with open(file_path, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(headers)
-        writer.writerows(rows)
-    print(f"✅ Exported to {file_path}")
-
-# -------------------- Database Init --------------------
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    # Users
-    cur.execute("""CREATE TABLE IF NOT EXISTS users(
-                    user_id TEXT PRIMARY KEY,
-                    username TEXT UNIQUE,
-                    password TEXT,
-                    role TEXT)""")
-    # Suppliers
-    cur.execute("""CREATE TABLE IF NOT EXISTS suppliers(
-                    supplier_id TEXT PRIMARY KEY,
-                    name TEXT,
-                    contact TEXT,
-                    address TEXT)""")
-    # Products
-    cur.execute("""CREATE TABLE IF NOT EXISTS products(
-                    product_id TEXT PRIMARY KEY,
-                    name TEXT,
-                    category TEXT,
-                    size TEXT,
-                    quantity INTEGER,
-                    price REAL,
-                    supplier_id TEXT,
-                    FOREIGN KEY(supplier_id) REFERENCES suppliers(supplier_id))""")
-    # Customers
-    cur.execute("""CREATE TABLE IF NOT EXISTS customers(
-                    customer_id TEXT PRIMARY KEY,
-                    name TEXT,
-                    contact TEXT)""")
-    # Sales
-    cur.execute("""CREATE TABLE IF NOT EXISTS sales(
-                    sale_id TEXT PRIMARY KEY,
-                    product_id TEXT,
-                    customer_id TEXT,
-                    quantity INTEGER,
-                    total REAL,
-                    date TEXT,
-                    FOREIGN KEY(product_id) REFERENCES products(product_id),
-                    FOREIGN KEY(customer_id) REFERENCES customers(customer_id))""")
-    # Default users
-    cur.execute("SELECT * FROM users")
-    if not cur.fetchall():
-        cur.execute("INSERT INTO users VALUES(?,?,?,?)",
-                    ("U_1", "admin", "admin123", "admin"))
-        cur.execute("INSERT INTO users VALUES(?,?,?,?)",
-                    ("U_2", "sales", "sales123", "salesperson"))
-    conn.commit()
-    conn.close()
+        count = stream_to_csv(file_path, headers, f"SELECT * FROM {filename}", progress=print_progress)
+        print()
+    else:
+        with open(file_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(rows)
+        count = len(rows)
+    print(f"✅ Exported {count} rows to {file_path}")
+
+def export_report_csv(name, since=None, until=None):
+    file_path, count = export_report(name, since, until, progress=print_progress)
+    print()
+    print(f"✅ Exported {count} rows to {file_path}")
 
 # -------------------- Authentication --------------------
 def login():
@@ -124,11 +113,7 @@ def login():
     print("=== Login ===")
     username = get_nonempty_input("Username: ")
     password = getpass.getpass("Password: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
-    row = cur.fetchone()
-    conn.close()
+    row = services.authenticate(username, password)
     if row:
         return row
     else:
@@ -138,46 +123,28 @@ def login():
 
 # -------------------- Supplier CRUD --------------------
 def view_suppliers():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM suppliers")
-    rows = cur.fetchall()
-    conn.close()
-    print_table(rows, ["Supplier ID", "Name", "Contact", "Address"])
-    pause()
+    browse("suppliers", ["supplier_id", "name", "contact", "address"], "supplier_id",
+           ["Supplier ID", "Name", "Contact", "Address"])
 
 def search_supplier():
     name = get_nonempty_input("Enter name to search: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM suppliers WHERE name LIKE ?", (f"%{name}%",))
-    rows = cur.fetchall()
-    conn.close()
+    rows = search_table("supplier", name)
     print_table(rows, ["Supplier ID", "Name", "Contact", "Address"])
     pause()
 
 def add_supplier():
-    sid = generate_id("suppliers", "SP", "supplier_id")
     name = get_nonempty_input("Name: ")
     contact = get_nonempty_input("Contact: ")
     address = get_nonempty_input("Address: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO suppliers VALUES(?,?,?,?)", (sid, name, contact, address))
-    conn.commit()
-    conn.close()
-    print("✅ Supplier added.")
+    sid = services.add("supplier", name=name, contact=contact, address=address)
+    print(f"✅ Supplier added with ID: {sid}")
     pause()
 
 def update_supplier():
     sid = get_nonempty_input("Supplier ID to update: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM suppliers WHERE supplier_id=?", (sid,))
-    row = cur.fetchone()
+    row = services.get("supplier", sid)
     if not row:
         print("❌ Supplier not found.")
-        conn.close()
         pause()
         return
     print("\nCurrent details:")
@@ -187,201 +154,222 @@ def update_supplier():
     name = input(f"New name (blank='{row[1]}'): ").strip() or row[1]
     contact = input(f"New contact (blank='{row[2]}'): ").strip() or row[2]
     address = input(f"New address (blank='{row[3]}'): ").strip() or row[3]
-    cur.execute("UPDATE suppliers SET name=?, contact=?, address=? WHERE supplier_id=?",
-                (name, contact, address, sid))
-    conn.commit()
-    conn.close()
+    services.update("supplier", sid, name=name, contact=contact, address=address)
     print("✅ Supplier updated.")
     pause()
 
 def delete_supplier():
     sid = get_nonempty_input("Supplier ID to delete: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM suppliers WHERE supplier_id=?", (sid,))
-    conn.commit()
-    conn.close()
+    services.delete("supplier", sid)
     print("✅ Supplier deleted (if existed).")
     pause()
 
 # -------------------- Product CRUD --------------------
 def view_products():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM products")
-    rows = cur.fetchall()
-    conn.close()
-    print_table(rows, ["Product ID", "Name", "Category", "Size", "Qty", "Price", "Supplier ID"])
-    pause()
+    browse("products", ["product_id", "name", "category", "size", "quantity", "price", "supplier_id"],
+           "product_id", ["Product ID", "Name", "Category", "Size", "Qty", "Price", "Supplier ID"])
 
 def add_product():
-    pid = generate_id("products", "PR", "product_id")
     name = get_nonempty_input("Name: ")
     category = get_nonempty_input("Category: ")
     size = get_nonempty_input("Size: ")
     quantity = int(get_nonempty_input("Quantity: "))
     price = float(get_nonempty_input("Price: "))
     supplier_id = get_nonempty_input("Supplier ID: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO products VALUES(?,?,?,?,?,?,?)",
-                (pid, name, category, size, quantity, price, supplier_id))
-    conn.commit()
-    conn.close()
-    print("✅ Product added.")
+    pid = services.add("product", name=name, category=category, size=size,
+                       quantity=quantity, price=price, supplier_id=supplier_id)
+    print(f"✅ Product added with ID: {pid}")
     pause()
 
 def update_product():
     pid = get_nonempty_input("Product ID to update: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM products WHERE product_id=?", (pid,))
-    row = cur.fetchone()
+    row = services.get("product", pid)
     if not row:
         print("❌ Product not found.")
-        conn.close()
         pause()
         return
     print("\nCurrent details:")
     print(f"Name:{row[1]}, Category:{row[2]}, Size:{row[3]}, Qty:{row[4]}, Price:{row[5]}, Supplier:{row[6]}")
-    name = input(f"New name (blank='{row[1]}'): ").strip() or row[1]
-    category = input(f"New category (blank='{row[2]}'): ").strip() or row[2]
-    size = input(f"New size (blank='{row[3]}'): ").strip() or row[3]
-    quantity = input(f"New quantity (blank='{row[4]}'): ").strip() or row[4]
-    price = input(f"New price (blank='{row[5]}'): ").strip() or row[5]
-    supplier_id = input(f"New supplier_id (blank='{row[6]}'): ").strip() or row[6]
-    cur.execute("UPDATE products SET name=?, category=?, size=?, quantity=?, price=?, supplier_id=? WHERE product_id=?",
-                (name, category, size, quantity, price, supplier_id, pid))
-    conn.commit()
-    conn.close()
+    # Blank keeps the stored value: only typed fields are written, so stock
+    # sold elsewhere since the (cached) details were read isn't overwritten
+    name = input(f"New name (blank='{row[1]}'): ").strip() or None
+    category = input(f"New category (blank='{row[2]}'): ").strip() or None
+    size = input(f"New size (blank='{row[3]}'): ").strip() or None
+    quantity = input(f"New quantity (blank='{row[4]}'): ").strip() or None
+    price = input(f"New price (blank='{row[5]}'): ").strip() or None
+    supplier_id = input(f"New supplier_id (blank='{row[6]}'): ").strip() or None
+    try:
+        # A changed quantity is recorded as a stock adjustment
+        services.update("product", pid, name=name, category=category, size=size,
+                        quantity=quantity and int(quantity), price=price and float(price),
+                        supplier_id=supplier_id)
+    except ValueError as e:
+        print(f"❌ {e}")
+        pause()
+        return
     print("✅ Product updated.")
     pause()
 
 def delete_product():
     pid = get_nonempty_input("Product ID to delete: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM products WHERE product_id=?", (pid,))
-    conn.commit()
-    conn.close()
+    services.delete("product", pid)
     print("✅ Product deleted (if existed).")
     pause()
 
+def choose_location(prompt="Location"):
+    # Only asked once a second location exists
+    ids = [row[0] for row in locations.list_locations()]
+    if len(ids) == 1:
+        return locations.DEFAULT
+    while True:
+        choice = input(f"{prompt} ({', '.join(ids)}; blank={locations.DEFAULT}): ").strip().upper()
+        if not choice:
+            return locations.DEFAULT
+        if choice in ids:
+            return choice
+        print("❌ Unknown location.")
+
+def receive_stock():
+    pid = get_nonempty_input("Product ID received: ")
+    location = choose_location()
+    qty = int(get_nonempty_input("Quantity received: "))
+    ref = input("Delivery / PO reference (optional): ").strip() or None
+    try:
+        stock = locations.receive(pid, location, qty, ref)
+    except ValueError as e:
+        print(f"❌ {e}")
+        pause()
+        return
+    print(f"✅ Receipt recorded. Stock is now {stock}.")
+    pause()
+
+def stock_history():
+    pid = get_nonempty_input("Product ID: ")
+    print_table(locations.history(pid), locations.MOVEMENT_HEADERS)
+    pause()
+
+def transfer_stock():
+    ids = [row[0] for row in locations.list_locations()]
+    if len(ids) == 1:
+        print("❌ Only one location exists. Add one with: inventory location add")
+        pause()
+        return
+    pid = get_nonempty_input("Product ID: ")
+    source = choose_location("From")
+    destination = choose_location("To")
+    qty = int(get_nonempty_input("Quantity: "))
+    try:
+        reference, left, arrived = locations.transfer(pid, source, destination, qty)
+    except ValueError as e:
+        print(f"❌ {e}")
+        pause()
+        return
+    print(f"✅ Transfer {reference} recorded. {source}: {left}, {destination}: {arrived}.")
+    pause()
+
+def bulk_update_products():
+    print("Choose products (leave blank to skip a filter):")
+    category = input("Category: ").strip() or None
+    supplier_id = input("Supplier ID: ").strip() or None
+    ids = [pid.strip() for pid in input("Product IDs (comma-separated): ").split(",") if pid.strip()] or None
+    print("Change: 1) price by %  2) price by amount  3) set price  4) add/remove stock  5) set stock")
+    change = input("Enter choice: ").strip()
+    try:
+        value = float(get_nonempty_input("Value: "))
+        options = {"category": category, "supplier_id": supplier_id, "ids": ids}
+        if change == "1": options["price_pct"] = value
+        elif change == "2": options["price_add"] = value
+        elif change == "3": options["price_set"] = value
+        elif change == "4": options["stock_add"] = int(value)
+        elif change == "5": options["stock_set"] = int(value)
+        else:
+            print("❌ Invalid choice.")
+            pause()
+            return
+        changed, summary = bulk_update.preview(**options)
+        if changed:
+            print_table(changed[:20], bulk_update.ROW_HEADERS)
+        for line in bulk_update.summary_lines(summary):
+            print(line)
+        if not changed or input("Apply these changes? (y/n): ").strip().lower() != "y":
+            print("No changes made.")
+            pause()
+            return
+        changed, summary = bulk_update.apply(**options)
+    except ValueError as e:
+        print(f"❌ {e}")
+        pause()
+        return
+    print(f"✅ {summary['changed']:,} products updated.")
+    pause()
+
 # -------------------- Customer CRUD --------------------
 def view_customers():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM customers")
-    rows = cur.fetchall()
-    conn.close()
-    print_table(rows, ["Customer ID", "Name", "Contact"])
-    pause()
+    browse("customers", ["customer_id", "name", "contact"], "customer_id",
+           ["Customer ID", "Name", "Contact"])
 
 def add_customer():
-    cid = generate_id("customers", "CU", "customer_id")
     name = get_nonempty_input("Name: ")
     contact = get_nonempty_input("Contact: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("INSERT INTO customers VALUES(?,?,?)", (cid, name, contact))
-    conn.commit()
-    conn.close()
-    print("✅ Customer added.")
+    cid = services.add("customer", name=name, contact=contact)
+    print(f"✅ Customer added with ID: {cid}")
     pause()
 
 def update_customer():
     cid = get_nonempty_input("Customer ID to update: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM customers WHERE customer_id=?", (cid,))
-    row = cur.fetchone()
+    row = services.get("customer", cid)
     if not row:
         print("❌ Customer not found.")
-        conn.close()
         pause()
         return
     print("\nCurrent details:")
     print(f"Name:{row[1]}, Contact:{row[2]}")
     name = input(f"New name (blank='{row[1]}'): ").strip() or row[1]
     contact = input(f"New contact (blank='{row[2]}'): ").strip() or row[2]
-    cur.execute("UPDATE customers SET name=?, contact=? WHERE customer_id=?",
-                (name, contact, cid))
-    conn.commit()
-    conn.close()
+    services.update("customer", cid, name=name, contact=contact)
     print("✅ Customer updated.")
     pause()
 
 def delete_customer():
     cid = get_nonempty_input("Customer ID to delete: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM customers WHERE customer_id=?", (cid,))
-    conn.commit()
-    conn.close()
+    services.delete("customer", cid)
     print("✅ Customer deleted (if existed).")
     pause()
 
 # -------------------- Sales CRUD --------------------
 def view_sales():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM sales")
-    rows = cur.fetchall()
-    conn.close()
-    print_table(rows, ["Sale ID", "Product ID", "Customer ID", "Qty", "Total", "Date"])
-    pause()
+    browse("sales", ["sale_id", "product_id", "customer_id", "quantity", "total", "date"], "sale_id",
+           ["Sale ID", "Product ID", "Customer ID", "Qty", "Total", "Date"])
 
 def add_sale():
     sales_list = []
 
-    # Ask customer once
+    # Ask customer (and location) once
     customer_id = get_nonempty_input("Customer ID: ")
-
-    # Get last sale number from DB
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT sale_id FROM sales ORDER BY ROWID DESC LIMIT 1")
-    last = cur.fetchone()
-    conn.close()
-    if last and last[0]:
-        try:
-            last_num = int(last[0].split("_")[1])
-        except:
-            last_num = 0
-    else:
-        last_num = 0
-
-    sale_counter = last_num + 1
+    location = choose_location()
 
     while True:
         product_id = get_nonempty_input("Product ID: ")
 
-        conn = sqlite3.connect(DB_NAME)
-        cur = conn.cursor()
-        cur.execute("SELECT name, price, quantity FROM products WHERE product_id=?", (product_id,))
-        row = cur.fetchone()
+        row = services.get("product", product_id)
         if not row:
             print("❌ Product not found.")
-            conn.close()
             continue
-        name, price, stock = row
+        name, price, stock = row[1], row[5], row[4]
+        if location != locations.DEFAULT:
+            stock = locations.level(product_id, location)
         print(f"Product: {name}, Price: {price}, Stock: {stock}")
 
         quantity = int(get_nonempty_input("Quantity: "))
         if quantity > stock:
             print("❌ Not enough stock.")
-            conn.close()
             continue
 
         total = price * quantity
         date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # Generate unique sale ID in memory
-        sid = f"SL_{sale_counter}"
-        sale_counter += 1
 
-        sales_list.append({"sale_id": sid, "product_id": product_id, "customer_id": customer_id,
+        sales_list.append({"product_id": product_id, "customer_id": customer_id,
                            "qty": quantity, "total": total, "date": date})
-        conn.close()
 
         more = input("Add another product to this sale? (y/n): ").strip().lower()
         if more != "y":
@@ -389,101 +377,168 @@ def add_sale():
 
     # Show confirmation list
     print("\n=== Confirm Sales ===")
-    table_data = [[s["sale_id"], s["product_id"], s["qty"], s["total"], s["date"]] for s in sales_list]
-    print_table(table_data, ["Sale ID", "Product ID", "Qty", "Total", "Date"])
+    table_data = [[i, s["product_id"], s["qty"], s["total"], s["date"]] for i, s in enumerate(sales_list, 1)]
+    print_table(table_data, ["Line", "Product ID", "Qty", "Total", "Date"])
     confirm = input("Confirm all sales? (y/n): ").strip().lower()
     if confirm != "y":
         print("❌ Sale cancelled.")
         pause()
         return
 
-    # Insert into DB
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    for s in sales_list:
-        cur.execute("INSERT INTO sales VALUES(?,?,?,?,?,?)",
-                    (s["sale_id"], s["product_id"], s["customer_id"], s["qty"], s["total"], s["date"]))
-        cur.execute("UPDATE products SET quantity = quantity - ? WHERE product_id=?", (s["qty"], s["product_id"]))
-    conn.commit()
-    conn.close()
-    print("✅ Sale(s) recorded.")
+    # Stock is re-checked and decremented in a single transaction
+    result = services.record_sale(customer_id, [(s["product_id"], s["qty"]) for s in sales_list],
+                                  location=location)
+    if not result["committed"]:
+        print("❌ Sale not recorded:")
+        for line in result["lines"]:
+            if line["status"] != "ok":
+                print(f"   {line['product_id']} x{line['qty']}: {line['status'].replace('_', ' ')}")
+        pause()
+        return
+    print(f"✅ Sale(s) recorded: {', '.join(line['sale_id'] for line in result['lines'])}")
     pause()
 
 def update_sale():
     sid = get_nonempty_input("Sale ID to update: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM sales WHERE sale_id=?", (sid,))
-    row = cur.fetchone()
+    row = services.get("sale", sid)
     if not row:
         print("❌ Sale not found.")
-        conn.close()
         pause()
         return
     print("\nCurrent details:")
     print(f"Product:{row[1]}, Customer:{row[2]}, Qty:{row[3]}, Total:{row[4]}, Date:{row[5]}")
-    product_id = input(f"New product_id (blank='{row[1]}'): ").strip() or row[1]
-    customer_id = input(f"New customer_id (blank='{row[2]}'): ").strip() or row[2]
-    quantity = input(f"New quantity (blank='{row[3]}'): ").strip() or row[3]
-    total = input(f"New total (blank='{row[4]}'): ").strip() or row[4]
-    date = input(f"New date (blank='{row[5]}'): ").strip() or row[5]
-    cur.execute("UPDATE sales SET product_id=?, customer_id=?, quantity=?, total=?, date=? WHERE sale_id=?",
-                (product_id, customer_id, quantity, total, date, sid))
-    conn.commit()
-    conn.close()
+    # Blank keeps the stored value: only typed fields are written
+    product_id = input(f"New product_id (blank='{row[1]}'): ").strip() or None
+    customer_id = input(f"New customer_id (blank='{row[2]}'): ").strip() or None
+    quantity = input(f"New quantity (blank='{row[3]}'): ").strip() or None
+    total = input(f"New total (blank='{row[4]}'): ").strip() or None
+    date = input(f"New date (blank='{row[5]}'): ").strip() or None
+    # Stock follows the edited product and quantity
+    try:
+        services.update("sale", sid, product_id=product_id, customer_id=customer_id,
+                        quantity=quantity and int(quantity), total=total and float(total), date=date)
+    except ValueError as e:
+        print(f"❌ {e}")
+        pause()
+        return
     print("✅ Sale updated.")
     pause()
 
 def delete_sale():
     sid = get_nonempty_input("Sale ID to delete: ")
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("DELETE FROM sales WHERE sale_id=?", (sid,))
-    conn.commit()
-    conn.close()
-    print("✅ Sale deleted (if existed).")
+    services.delete("sale", sid)
+    print("✅ Sale deleted (if existed), its units are back in stock.")
+    pause()
+
+def return_sale():
+    sid = get_nonempty_input("Sale ID being returned: ")
+    qty = input("Quantity returned (blank=all): ").strip()
+    try:
+        stock = services.return_sale(sid, int(qty) if qty else None)
+    except ValueError as e:
+        print(f"❌ {e}")
+        pause()
+        return
+    print(f"✅ Return recorded. Stock is now {stock}.")
+    pause()
+
+# -------------------- Search --------------------
+def search_all():
+    text = get_nonempty_input("Search suppliers, products and customers: ")
+    rows = [row[:4] for row in search(text)]
+    print_table(rows, ["Type", "ID", "Name", "Details"])
     pause()
 
 # -------------------- Reports --------------------
 def stock_report():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT product_id, name, quantity FROM products")
-    rows = cur.fetchall()
-    conn.close()
-    print_table(rows, ["Product ID", "Name", "Qty"])
+    print_table(services.report_rows("stock_report"), ["Product ID", "Name", "Qty"],
+                lambda: services.report_widths("stock_report"))
     export = input("Export this report to CSV? (y/n): ").strip().lower()
     if export == "y":
-        export_to_csv("stock_report", ["Product ID", "Name", "Qty"], rows)
+        export_report_csv("stock_report")
     pause()
 
 def sales_report():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("SELECT sale_id, product_id, customer_id, quantity, total, date FROM sales")
-    rows = cur.fetchall()
-    conn.close()
-    print_table(rows, ["Sale ID", "Product", "Customer", "Qty", "Total", "Date"])
+    print_table(services.report_rows("sales_report"), ["Sale ID", "Product", "Customer", "Qty", "Total", "Date"],
+                lambda: services.report_widths("sales_report"))
     export = input("Export this report to CSV? (y/n): ").strip().lower()
     if export == "y":
-        export_to_csv("sales_report", ["Sale ID", "Product", "Customer", "Qty", "Total", "Date"], rows)
+        since = get_date_input("From date YYYY-MM-DD (blank=all): ")
+        until = get_date_input("To date YYYY-MM-DD (blank=all): ")
+        export_report_csv("sales_report", since, until)
     pause()
 
 def supplier_report():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT s.supplier_id, s.name, IFNULL(p.name, '-') AS product_name, IFNULL(p.quantity, 0) AS qty
-        FROM suppliers s
-        LEFT JOIN products p ON s.supplier_id = p.supplier_id
-        ORDER BY s.name
-    """)
-    rows = cur.fetchall()
-    conn.close()
+    rows = list(services.report_rows("supplier_report"))
     print_table(rows, ["Supplier ID", "Supplier Name", "Product", "Qty"])
     export = input("Export this report to CSV? (y/n): ").strip().lower()
     if export == "y":
-        export_to_csv("supplier_report", ["Supplier ID", "Supplier Name", "Product", "Qty"], rows)
+        export_report_csv("supplier_report")
+    pause()
+
+def analytics_report(name, title):
+    since = get_date_input("From date YYYY-MM-DD (blank=all): ")
+    until = get_date_input("To date YYYY-MM-DD (blank=all): ")
+    top = None
+    if name in ("product", "customer", "top"):
+        top = input("Top N (blank=all): ").strip()
+        top = int(top) if top.isdigit() else None
+    # Everything except per-customer revenue reads the incremental daily summary
+    rows = analytics.report(name, since, until, top, summary=True)
+    print(f"\n=== {title} ===")
+    print_table(rows, analytics.HEADERS[name])
+    export = input("Export this report to CSV? (y/n): ").strip().lower()
+    if export == "y":
+        export_to_csv(f"revenue_by_{name}", analytics.HEADERS[name], rows)
+    pause()
+
+def reorder_report():
+    rows = reorder.alerts()
+    print("\n=== Reorder Suggestions ===")
+    print_table(rows, reorder.ALERT_HEADERS)
+    if not rows:
+        pause()
+        return
+    orders = reorder.purchase_orders(rows)
+    for sid, (supplier, lines, cost) in orders.items():
+        print(f"\nPurchase order for {supplier} ({sid}): {len(lines)} line(s), total {cost}")
+    export = input("Export purchase orders to CSV? (y/n): ").strip().lower()
+    if export == "y":
+        export_to_csv("purchase_orders", reorder.ORDER_HEADERS, list(reorder.order_rows(orders)))
+    pause()
+
+def reconcile_stock():
+    snap_id, folded = ledger.snapshot()
+    print(f"Snapshot {snap_id} taken ({folded} new movements).")
+    rows = ledger.reconcile()
+    if not rows:
+        print("✅ Stock matches the movement ledger.")
+        pause()
+        return
+    print_table(rows, ledger.MISMATCH_HEADERS)
+    fix = input("Reset these quantities to the ledger balance? (y/n): ").strip().lower()
+    if fix == "y":
+        ledger.reconcile(fix=True)
+        print(f"✅ {len(rows)} product(s) corrected.")
+    pause()
+
+def location_report():
+    print("\n=== Stock by Location ===")
+    print_table(locations.location_totals(), locations.LOCATION_HEADERS)
+    pid = input("Product ID to break down (blank=all, 0=skip): ").strip()
+    if pid != "0":
+        print_table(locations.product_totals(pid or None), locations.PRODUCT_HEADERS)
+    pause()
+
+def show_profile():
+    # With INVENTORY_PROFILE=1: slowest statements and render steps so far
+    if not profiling.ENABLED:
+        return
+    print("\n=== Query Profile (since start) ===")
+    print_table(profiling.summary(), profiling.SUMMARY_HEADERS)
+    file_path = profiling.write_metrics()
+    if file_path:
+        print(f"✅ Metrics written to {file_path}")
     pause()
 
 # -------------------- Menus --------------------
@@ -506,7 +561,8 @@ def product_menu():
     while True:
         clear_screen()
         print_menu("Manage Products ---", [
-            "Back", "View Products", "Add Product", "Update Product", "Delete Product"
+            "Back", "View Products", "Add Product", "Update Product", "Delete Product",
+            "Receive Stock", "Stock History", "Transfer Stock", "Bulk Update"
         ])
         ch = input("Enter choice: ").strip()
         if ch == "0": break
@@ -514,6 +570,10 @@ def product_menu():
         elif ch == "2": add_product()
         elif ch == "3": update_product()
         elif ch == "4": delete_product()
+        elif ch == "5": receive_stock()
+        elif ch == "6": stock_history()
+        elif ch == "7": transfer_stock()
+        elif ch == "8": bulk_update_products()
 
 def customer_menu():
     while True:
@@ -532,7 +592,7 @@ def sales_menu():
     while True:
         clear_screen()
         print_menu("Sales Menu ---", [
-            "Back", "Add Sale", "View Sales", "Update Sale", "Delete Sale"
+            "Back", "Add Sale", "View Sales", "Update Sale", "Delete Sale", "Return Sale"
         ])
         ch = input("Enter choice: ").strip()
         if ch == "0": break
@@ -540,18 +600,36 @@ def sales_menu():
         elif ch == "2": view_sales()
         elif ch == "3": update_sale()
         elif ch == "4": delete_sale()
+        elif ch == "5": return_sale()
 
 def reports_menu():
     while True:
         clear_screen()
         print_menu("Reports Menu ---", [
-            "Back", "Stock Report", "Sales Report", "Supplier Report"
+            "Back", "Stock Report", "Sales Report", "Supplier Report", "Sales Analytics",
+            "Reorder Suggestions", "Reconcile Stock", "Stock by Location"
         ])
         ch = input("Enter choice: ").strip()
         if ch == "0": break
         elif ch == "1": stock_report()
         elif ch == "2": sales_report()
         elif ch == "3": supplier_report()
+        elif ch == "4": analytics_menu()
+        elif ch == "5": reorder_report()
+        elif ch == "6": reconcile_stock()
+        elif ch == "7": location_report()
+
+def analytics_menu():
+    reports = [("day", "Revenue by Day"), ("week", "Revenue by Week"), ("month", "Revenue by Month"),
+               ("product", "Revenue by Product"), ("customer", "Revenue by Customer"),
+               ("category", "Revenue by Category"), ("top", "Top Sellers per Category")]
+    while True:
+        clear_screen()
+        print_menu("Sales Analytics ---", ["Back"] + [title for _, title in reports])
+        ch = input("Enter choice: ").strip()
+        if ch == "0": break
+        elif ch.isdigit() and 1 <= int(ch) <= len(reports):
+            analytics_report(*reports[int(ch) - 1])
 
 def main_menu(user):
     role = user[3]  # admin or salesperson
@@ -562,9 +640,9 @@ def main_menu(user):
         menu_options = ["Logout"]
 
         if role == "admin":
-            menu_options += ["Suppliers", "Products", "Customers", "Sales", "Reports"]
+            menu_options += ["Suppliers", "Products", "Customers", "Sales", "Reports", "Search"]
         elif role == "salesperson":
-            menu_options += ["Suppliers (View Only)", "Products (View Only)", "Customers", "Sales", "Reports"]
+            menu_options += ["Suppliers (View Only)", "Products (View Only)", "Customers", "Sales", "Reports", "Search"]
 
         print_menu("Main Menu ---", menu_options)
         ch = input("Enter choice: ").strip()
@@ -580,6 +658,7 @@ def main_menu(user):
             elif ch == "3": customer_menu()
             elif ch == "4": sales_menu()
             elif ch == "5": reports_menu()
+            elif ch == "6": search_all()
         # Salesperson limited access
         elif role == "salesperson":
             if ch == "1":
@@ -596,14 +675,18 @@ def main_menu(user):
                 sales_menu()  # full access
             elif ch == "5":
                 reports_menu()  # full access (with export)
+            elif ch == "6":
+                search_all()
 
 # -------------------- Program Start --------------------
 if __name__ == "__main__":
     init_db()
+    product_cache.warm()
     while True:
         user = login()
         if user:
             main_menu(user)
+            show_profile()
         else:
             # If login fails, ask again
             continue
@@ -0,0 +1,151 @@
+
+from datetime import datetime
+
+from db import transaction
+from cache import product_cache
+
+OPENING = "opening"
+RECEIPT = "receipt"
+SALE = "sale"
+RETURN = "return"
+ADJUSTMENT = "adjustment"
+
+KEEP_SNAPSHOTS = 7
+
+# -------------------- Tables --------------------
+def create_ledger(conn):
+    # Append-only stock movements. products.quantity is the running balance
+    # of a product's movements, updated in the same transaction as each one.
+    conn.execute("""CREATE TABLE IF NOT EXISTS stock_movements(
+                    movement_id INTEGER PRIMARY KEY,
+                    product_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    reference TEXT,
+                    note TEXT,
+                    created_at TEXT NOT NULL)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_movements_product ON stock_movements(product_id, movement_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_movements_reference ON stock_movements(reference)")
+    # Balance of every product as of movement_id; reconciliation only has
+    # to sum the movements recorded after the latest snapshot
+    conn.execute("""CREATE TABLE IF NOT EXISTS stock_snapshots(
+                    snapshot_id INTEGER PRIMARY KEY,
+                    movement_id INTEGER NOT NULL,
+                    taken_at TEXT NOT NULL)""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS stock_snapshot_lines(
+                    snapshot_id INTEGER,
+                    product_id TEXT,
+                    quantity INTEGER,
+                    PRIMARY KEY(snapshot_id, product_id)) WITHOUT ROWID""")
+
+def now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+# -------------------- Movements --------------------
+def log(conn, movements):
+    # movements: (product_id, kind, quantity, reference, note). Records only;
+    # the caller has already changed products.quantity.
+    stamp = now()
+    conn.executemany("""INSERT INTO stock_movements(product_id, kind, quantity, reference, note, created_at)
+                        VALUES(?,?,?,?,?,?)""", [(*m, stamp) for m in movements])
+
+def record(conn, product_id, kind, quantity, reference=None, note=None):
+    # Applies one movement inside the caller's transaction. Stock may not go
+    # below zero; raises ValueError for unknown products and shortfalls.
+    row = conn.execute("SELECT quantity FROM products WHERE product_id=?", (product_id,)).fetchone()
+    if not row:
+        raise ValueError(f"Product {product_id} not found")
+    if row[0] + quantity < 0:
+        raise ValueError(f"Not enough stock for {product_id}: {row[0]} left")
+    product_cache.invalidate([product_id])
+    conn.execute("UPDATE products SET quantity = quantity + ? WHERE product_id=?", (quantity, product_id))
+    log(conn, [(product_id, kind, quantity, reference, note)])
+    return row[0] + quantity
+
+def receive(conn, product_id, quantity, reference=None, note=None):
+    if quantity <= 0:
+        raise ValueError("Received quantity must be positive")
+    return record(conn, product_id, RECEIPT, quantity, reference, note)
+
+def adjust(conn, product_id, counted, note=None):
+    # Sets stock to a counted quantity through an adjustment movement
+    row = conn.execute("SELECT quantity FROM products WHERE product_id=?", (product_id,)).fetchone()
+    if not row:
+        raise ValueError(f"Product {product_id} not found")
+    if counted < 0:
+        raise ValueError("Quantity can't be negative")
+    if counted != row[0]:
+        record(conn, product_id, ADJUSTMENT, counted - row[0], note=note)
+    return counted
+
+# -------------------- Snapshots & Reconciliation --------------------
+def snapshot(path=None):
+    # New snapshot = previous snapshot + movements since it. Returns
+    # (snapshot_id, movements folded in).
+    with transaction(path, immediate=True) as conn:
+        prev = conn.execute("SELECT snapshot_id, movement_id FROM stock_snapshots "
+                            "ORDER BY snapshot_id DESC LIMIT 1").fetchone()
+        prev_id, since = prev or (None, 0)
+        high = conn.execute("SELECT IFNULL(MAX(movement_id), 0) FROM stock_movements").fetchone()[0]
+        snap_id = conn.execute("INSERT INTO stock_snapshots(movement_id, taken_at) VALUES(?,?)",
+                               (high, now())).lastrowid
+        conn.execute("""INSERT INTO stock_snapshot_lines
+                        SELECT ?, product_id, SUM(quantity) FROM (
+                            SELECT product_id, quantity FROM stock_snapshot_lines WHERE snapshot_id = ?
+                            UNION ALL
+                            SELECT product_id, quantity FROM stock_movements
+                            WHERE movement_id > ? AND movement_id <= ? AND location_id='MAIN')
+                        GROUP BY product_id""", (snap_id, prev_id, since, high))
+        conn.execute("""DELETE FROM stock_snapshot_lines WHERE snapshot_id IN (
+                            SELECT snapshot_id FROM stock_snapshots ORDER BY snapshot_id DESC LIMIT -1 OFFSET ?)""",
+                     (KEEP_SNAPSHOTS,))
+        conn.execute("""DELETE FROM stock_snapshots WHERE snapshot_id IN (
+                            SELECT snapshot_id FROM stock_snapshots ORDER BY snapshot_id DESC LIMIT -1 OFFSET ?)""",
+                     (KEEP_SNAPSHOTS,))
+    return snap_id, high - since
+
+def ledger_balances_sql():
+    return """SELECT product_id, SUM(quantity) AS quantity FROM (
+                  SELECT product_id, quantity FROM stock_snapshot_lines
+                  WHERE snapshot_id = (SELECT MAX(snapshot_id) FROM stock_snapshots)
+                  UNION ALL
+                  SELECT product_id, quantity FROM stock_movements
+                  WHERE movement_id > (SELECT IFNULL(MAX(movement_id), 0) FROM stock_snapshots)
+                        AND location_id='MAIN')
+              GROUP BY product_id"""
+
+def reconcile(fix=False, path=None):
+    # Products whose MAIN quantity differs from their ledger balance:
+    # (product_id, name, recorded, ledger, difference). With fix, the
+    # recorded quantity is reset to the ledger balance.
+    with transaction(path, immediate=fix) as conn:
+        rows = conn.execute(f"""SELECT p.product_id, p.name, p.quantity, IFNULL(l.quantity, 0),
+                                       p.quantity - IFNULL(l.quantity, 0)
+                                FROM products p LEFT JOIN ({ledger_balances_sql()}) l
+                                     ON l.product_id = p.product_id
+                                WHERE p.quantity IS NOT IFNULL(l.quantity, 0)
+                                ORDER BY p.product_id""").fetchall()
+        if fix and rows:
+            product_cache.invalidate([row[0] for row in rows])
+            conn.executemany("UPDATE products SET quantity=? WHERE product_id=?",
+                             [(row[3], row[0]) for row in rows])
+    product_cache.flush()
+    return rows
+
+def backfill(conn):
+    # Opening balances that, with one movement per existing sale, add up to
+    # the current stock
+    stamp = now()
+    if conn.execute("SELECT 1 FROM stock_movements LIMIT 1").fetchone():
+        return
+    conn.execute("""INSERT INTO stock_movements(product_id, kind, quantity, reference, note, created_at)
+                    SELECT p.product_id, ?, IFNULL(p.quantity, 0) + IFNULL(s.units, 0), NULL, 'ledger opened', ?
+                    FROM products p
+                    LEFT JOIN (SELECT product_id, SUM(quantity) AS units FROM sales GROUP BY product_id) s
+                         ON s.product_id = p.product_id""", (OPENING, stamp))
+    conn.execute("""INSERT INTO stock_movements(product_id, kind, quantity, reference, note, created_at)
+                    SELECT s.product_id, ?, -s.quantity, s.sale_id, NULL, s.date
+                    FROM sales s JOIN products p ON p.product_id = s.product_id
+                    WHERE s.quantity IS NOT NULL ORDER BY s.rowid""", (SALE,))
+
+MISMATCH_HEADERS = ["Product ID", "Name", "Recorded", "Ledger", "Difference"]
@@ -0,0 +1,284 @@
+
+import os
+import re
+
+import db
+import ledger
+from db import connection, transaction
+from cache import product_cache
+from ids import next_id
+
+DEFAULT = "MAIN"  # the original store: its stock is products.quantity
+TRANSFER = "transfer"
+
+# -------------------- Schema --------------------
+LEVELS = """CREATE TABLE IF NOT EXISTS {schema}.stock_levels(
+            location_id TEXT,
+            product_id TEXT,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY(location_id, product_id)) WITHOUT ROWID"""
+
+MOVEMENTS = """CREATE TABLE IF NOT EXISTS {schema}.stock_movements(
+               movement_id INTEGER PRIMARY KEY,
+               product_id TEXT NOT NULL,
+               kind TEXT NOT NULL,
+               quantity INTEGER NOT NULL,
+               reference TEXT,
+               note TEXT,
+               created_at TEXT NOT NULL,
+               location_id TEXT NOT NULL DEFAULT 'MAIN')"""
+
+def create_locations(conn):
+    # Every location other than MAIN keeps its stock in stock_levels, either
+    # in this file or, when sharded, in its own file attached as loc_<id>
+    # that also holds that location's movements.
+    conn.execute("""CREATE TABLE IF NOT EXISTS locations(
+                    location_id TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    db_file TEXT)""")
+    conn.execute("INSERT OR IGNORE INTO locations VALUES(?, 'Main store', NULL)", (DEFAULT,))
+    conn.execute("INSERT OR IGNORE INTO id_sequences VALUES('TR', 0)")
+    conn.execute(LEVELS.format(schema="main"))
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(stock_movements)")]
+    if "location_id" not in columns:
+        conn.execute(f"ALTER TABLE stock_movements ADD COLUMN location_id TEXT NOT NULL DEFAULT '{DEFAULT}'")
+
+def schema_name(location_id):
+    return "loc_" + re.sub(r"\W", "_", location_id.lower())
+
+def attach(conn):
+    # ATTACH is per connection and not allowed inside a transaction, so
+    # writers pass this as the setup of db.transaction()
+    attached = {row[1] for row in conn.execute("PRAGMA database_list")}
+    for location_id, db_file in conn.execute("SELECT location_id, db_file FROM locations WHERE db_file IS NOT NULL"):
+        name = schema_name(location_id)
+        if name not in attached:
+            conn.execute("ATTACH DATABASE ? AS " + name, (db_file,))
+            conn.execute(f"PRAGMA {name}.journal_mode=WAL")
+
+def schema_for(conn, location_id):
+    # None for MAIN, else the schema holding the location's stock_levels
+    row = conn.execute("SELECT db_file FROM locations WHERE location_id=?", (location_id,)).fetchone()
+    if not row:
+        raise ValueError(f"Unknown location: {location_id}")
+    if location_id == DEFAULT:
+        return None
+    if row[0] is None:
+        return "main"
+    return schema_name(location_id)
+
+def add_location(location_id, name, shard=False, path=None):
+    location_id = location_id.strip().upper()
+    if not re.fullmatch(r"[A-Z0-9_]+", location_id):
+        raise ValueError("Location IDs use letters, digits and underscores only")
+    db_file = None
+    if shard:
+        main = os.path.abspath(path or db.DB_NAME)
+        db_file = f"{os.path.splitext(main)[0]}_{location_id.lower()}.db"
+    with connection(path) as conn:
+        if conn.execute("SELECT 1 FROM locations WHERE location_id=?", (location_id,)).fetchone():
+            raise ValueError(f"Location {location_id} already exists")
+        if db_file:
+            # The shard file is created (outside any transaction) before it is registered
+            schema = schema_name(location_id)
+            conn.execute("ATTACH DATABASE ? AS " + schema, (db_file,))
+            conn.execute(f"PRAGMA {schema}.journal_mode=WAL")
+            conn.execute(LEVELS.format(schema=schema))
+            conn.execute(MOVEMENTS.format(schema=schema))
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_movements_product "
+                         "ON stock_movements(product_id, movement_id)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_movements_reference "
+                         "ON stock_movements(reference)")
+            conn.commit()
+        conn.execute("INSERT INTO locations VALUES(?,?,?)", (location_id, name, db_file))
+        conn.commit()
+    return location_id, db_file
+
+def list_locations(path=None):
+    with connection(path) as conn:
+        return conn.execute("SELECT location_id, name, IFNULL(db_file, '-') FROM locations ORDER BY rowid").fetchall()
+
+# -------------------- Stock Moves --------------------
+def move(conn, product_id, location_id, kind, quantity, reference=None, note=None):
+    # Changes stock at one location and records the movement there. The
+    # guarded write comes first, so a sharded location only takes its own
+    # file's write lock. Returns the new quantity.
+    schema = schema_for(conn, location_id)
+    if schema is None:
+        return ledger.record(conn, product_id, kind, quantity, reference, note)
+    if not conn.execute("SELECT 1 FROM products WHERE product_id=?", (product_id,)).fetchone():
+        raise ValueError(f"Product {product_id} not found")
+    if quantity >= 0:
+        conn.execute(f"""INSERT INTO {schema}.stock_levels VALUES(?,?,?)
+                         ON CONFLICT(location_id, product_id) DO UPDATE SET quantity = quantity + excluded.quantity""",
+                     (location_id, product_id, quantity))
+    elif conn.execute(f"""UPDATE {schema}.stock_levels SET quantity = quantity + ?
+                          WHERE location_id=? AND product_id=? AND quantity >= ?""",
+                      (quantity, location_id, product_id, -quantity)).rowcount != 1:
+        raise ValueError(f"Not enough stock for {product_id} at {location_id}: "
+                         f"{stock_at(conn, product_id, location_id)} left")
+    conn.execute(f"""INSERT INTO {schema}.stock_movements(product_id, kind, quantity, reference, note,
+                                                          created_at, location_id)
+                     VALUES(?,?,?,?,?,?,?)""",
+                 (product_id, kind, quantity, reference, note, ledger.now(), location_id))
+    return stock_at(conn, product_id, location_id)
+
+def stock_at(conn, product_id, location_id):
+    schema = schema_for(conn, location_id)
+    if schema is None:
+        row = conn.execute("SELECT quantity FROM products WHERE product_id=?", (product_id,)).fetchone()
+    else:
+        row = conn.execute(f"SELECT quantity FROM {schema}.stock_levels WHERE location_id=? AND product_id=?",
+                           (location_id, product_id)).fetchone()
+    return row[0] if row else 0
+
+def level(product_id, location_id, path=None):
+    with connection(path) as conn:
+        attach(conn)
+        return stock_at(conn, product_id, location_id)
+
+def receive(product_id, location_id, quantity, reference=None, note=None, path=None):
+    if quantity <= 0:
+        raise ValueError("Received quantity must be positive")
+    with transaction(path, immediate=True, setup=attach) as conn:
+        balance = move(conn, product_id, location_id, ledger.RECEIPT, quantity, reference, note)
+    product_cache.flush()
+    return balance
+
+def adjust(product_id, location_id, counted, note=None, path=None):
+    if counted < 0:
+        raise ValueError("Quantity can't be negative")
+    with transaction(path, immediate=True, setup=attach) as conn:
+        delta = counted - stock_at(conn, product_id, location_id)
+        balance = move(conn, product_id, location_id, ledger.ADJUSTMENT, delta, note=note) if delta else counted
+    product_cache.flush()
+    return balance
+
+def transfer(product_id, source, destination, quantity, note=None, path=None):
+    # One transaction over both locations. Between two files in WAL mode
+    # SQLite commits each file atomically but not the pair, so a crash in
+    # the middle of COMMIT can leave one side applied.
+    if quantity <= 0:
+        raise ValueError("Transfer quantity must be positive")
+    if source == destination:
+        raise ValueError("Source and destination are the same location")
+    with transaction(path, immediate=True, setup=attach) as conn:
+        reference = next_id(conn, "TR")
+        left = move(conn, product_id, source, TRANSFER, -quantity, reference, note)
+        arrived = move(conn, product_id, destination, TRANSFER, quantity, reference, note)
+    product_cache.flush()
+    return reference, left, arrived
+
+# -------------------- Location Checkout --------------------
+def sell(conn, location_id, decrements):
+    # Takes {product_id: units} out of a non-MAIN location with guarded
+    # decrements. Returns the products that fell short, writing nothing then.
+    schema = schema_for(conn, location_id)
+    conn.execute("SAVEPOINT location_sale")
+    short = [pid for pid, qty in decrements.items()
+             if conn.execute(f"""UPDATE {schema}.stock_levels SET quantity = quantity - ?
+                                 WHERE location_id=? AND product_id=? AND quantity >= ?""",
+                             (qty, location_id, pid, qty)).rowcount != 1]
+    if short:
+        conn.execute("ROLLBACK TO location_sale")
+    conn.execute("RELEASE location_sale")
+    return short
+
+def log_sales(conn, location_id, lines):
+    schema = schema_for(conn, location_id)
+    stamp = ledger.now()
+    conn.executemany(f"""INSERT INTO {schema}.stock_movements(product_id, kind, quantity, reference, note,
+                                                              created_at, location_id)
+                         VALUES(?,?,?,?,NULL,?,?)""",
+                     [(line["product_id"], ledger.SALE, -line["qty"], line["sale_id"], stamp, location_id)
+                      for line in lines])
+
+# -------------------- Returns & Sale Edits --------------------
+def sale_held(conn, sale_id):
+    # (location_id, net units the sale still holds there) from the sale's
+    # movements in whichever schema has them, or None for sales recorded
+    # without any movement (history from before the ledger)
+    for schema in schemas(conn):
+        row = conn.execute(f"""SELECT location_id, -SUM(quantity) FROM {schema}.stock_movements
+                               WHERE reference=? AND kind IN (?, ?) GROUP BY location_id""",
+                           (sale_id, ledger.SALE, ledger.RETURN)).fetchone()
+        if row:
+            return row
+    return None
+
+def return_sale(conn, sale_id, quantity=None, note=None):
+    # Puts returned units back at the location the sale was made from; the
+    # sale row itself is unchanged. Returns that location's new stock.
+    sale = conn.execute("SELECT product_id, quantity FROM sales WHERE sale_id=?", (sale_id,)).fetchone()
+    if not sale:
+        raise ValueError(f"Sale {sale_id} not found")
+    location_id, held = sale_held(conn, sale_id) or (DEFAULT, sale[1])
+    if held <= 0:
+        raise ValueError(f"Nothing left to return on {sale_id}")
+    quantity = held if quantity is None else quantity
+    if not 0 < quantity <= held:
+        raise ValueError(f"Can return 1 to {held} units of {sale_id}")
+    return move(conn, sale[0], location_id, ledger.RETURN, quantity, sale_id, note)
+
+def sale_changed(conn, sale_id, old, new):
+    # Keeps stock in step at the sale's location when its product or
+    # quantity is edited or the sale is deleted (new is None). old/new are
+    # (product_id, quantity).
+    found = sale_held(conn, sale_id)
+    if found is None:
+        return
+    location_id, held = found
+    if held and conn.execute("SELECT 1 FROM products WHERE product_id=?", (old[0],)).fetchone():
+        move(conn, old[0], location_id, ledger.RETURN, held, sale_id, "sale edited" if new else "sale deleted")
+    if new:
+        move(conn, new[0], location_id, ledger.SALE, -new[1], sale_id, "sale edited")
+
+# -------------------- Reports --------------------
+def schemas(conn):
+    attach(conn)
+    return ["main"] + [schema_name(location_id) for (location_id,) in
+                       conn.execute("SELECT location_id FROM locations WHERE db_file IS NOT NULL")]
+
+def levels_sql(conn):
+    # (location_id, product_id, quantity) across MAIN and every location
+    parts = [f"SELECT '{DEFAULT}' AS location_id, product_id, quantity FROM main.products"]
+    parts += [f"SELECT location_id, product_id, quantity FROM {schema}.stock_levels" for schema in schemas(conn)]
+    return " UNION ALL ".join(parts)
+
+def elsewhere_sql(conn):
+    # (product_id, quantity) summed over every location other than MAIN
+    parts = [f"SELECT product_id, quantity FROM {schema}.stock_levels" for schema in schemas(conn)]
+    return f"SELECT product_id, SUM(quantity) AS quantity FROM ({' UNION ALL '.join(parts)}) GROUP BY product_id"
+
+def location_totals(path=None):
+    with connection(path) as conn:
+        return conn.execute(f"""SELECT l.location_id, l.name, COUNT(s.product_id), IFNULL(SUM(s.quantity), 0),
+                                       ROUND(IFNULL(SUM(s.quantity * p.price), 0), 2)
+                                FROM locations l
+                                LEFT JOIN ({levels_sql(conn)}) s ON s.location_id = l.location_id AND s.quantity > 0
+                                LEFT JOIN products p ON p.product_id = s.product_id
+                                GROUP BY l.location_id ORDER BY l.rowid""").fetchall()
+
+def product_totals(product_id=None, path=None):
+    # Per product: total units and a 'LOC:qty' breakdown
+    with connection(path) as conn:
+        return conn.execute(f"""SELECT p.product_id, p.name, SUM(s.quantity),
+                                       GROUP_CONCAT(s.location_id || ':' || s.quantity, ' ')
+                                FROM products p JOIN ({levels_sql(conn)}) s ON s.product_id = p.product_id
+                                WHERE s.quantity <> 0 AND (? IS NULL OR p.product_id = ?)
+                                GROUP BY p.product_id ORDER BY p.rowid""", (product_id, product_id)).fetchall()
+
+def history(product_id, limit=50, path=None):
+    # Movements of a product at every location, newest first
+    with connection(path) as conn:
+        union = " UNION ALL ".join(f"""SELECT created_at, location_id, kind, quantity, reference, note, movement_id
+                                        FROM {schema}.stock_movements WHERE product_id=:pid"""
+                                   for schema in schemas(conn))
+        return conn.execute(f"""SELECT created_at, location_id, kind, quantity, reference, note FROM ({union})
+                                ORDER BY created_at DESC, movement_id DESC LIMIT :limit""",
+                            {"pid": product_id, "limit": limit}).fetchall()
+
+LOCATION_HEADERS = ["Location", "Name", "Products", "Units", "Stock Value"]
+PRODUCT_HEADERS = ["Product ID", "Name", "Total Units", "By Location"]
+LIST_HEADERS = ["Location", "Name", "Shard File"]
+MOVEMENT_HEADERS = ["Date", "Location", "Kind", "Qty", "Reference", "Note"]
@@ -0,0 +1,81 @@
+
+from db import connection
+
+PAGE_SIZE = 20
+
+# -------------------- Keyset Pager --------------------
+class Pager:
+    # Seeks by rowid instead of OFFSET, so every page costs one index range
+    # scan of page_size rows no matter how deep into the table it is.
+    def __init__(self, table, columns, key, page_size=PAGE_SIZE, path=None):
+        self.table = table
+        self.columns = columns
+        self.key = key
+        self.page_size = page_size
+        self.path = path
+        self.rows = []
+        self.has_prev = False
+        self.has_next = False
+
+    def _select(self, where, order, params, limit):
+        cols = ", ".join(self.columns)
+        sql = (f"SELECT rowid, {cols} FROM {self.table} {where} "
+               f"ORDER BY rowid {order} LIMIT ?")
+        with connection(self.path) as conn:
+            return conn.execute(sql, (*params, limit)).fetchall()
+
+    def _exists(self, where, params):
+        with connection(self.path) as conn:
+            return conn.execute(f"SELECT 1 FROM {self.table} {where} LIMIT 1", params).fetchone() is not None
+
+    def _load_forward(self, where="", params=()):
+        rows = self._select(where, "ASC", params, self.page_size + 1)
+        self.has_next = len(rows) > self.page_size
+        self.rows = rows[:self.page_size]
+        self.has_prev = bool(self.rows) and self._exists("WHERE rowid < ?", (self.rows[0][0],))
+        return self.page()
+
+    def _load_backward(self, where="", params=()):
+        rows = self._select(where, "DESC", params, self.page_size + 1)
+        self.has_prev = len(rows) > self.page_size
+        self.rows = rows[:self.page_size][::-1]
+        self.has_next = bool(self.rows) and self._exists("WHERE rowid > ?", (self.rows[-1][0],))
+        return self.page()
+
+    def page(self):
+        return [row[1:] for row in self.rows]
+
+    def first(self):
+        return self._load_forward()
+
+    def last(self):
+        return self._load_backward()
+
+    def next(self):
+        if not self.rows:
+            return self.first()
+        if self.has_next:
+            self._load_forward("WHERE rowid > ?", (self.rows[-1][0],))
+        return self.page()
+
+    def prev(self):
+        if not self.rows:
+            return self.first()
+        if self.has_prev:
+            self._load_backward("WHERE rowid < ?", (self.rows[0][0],))
+        return self.page()
+
+    def jump(self, key_value):
+        # Start the page at the row with the given primary key
+        with connection(self.path) as conn:
+            row = conn.execute(f"SELECT rowid FROM {self.table} WHERE {self.key}=?",
+                               (key_value,)).fetchone()
+        if not row:
+            return None
+        return self._load_forward("WHERE rowid >= ?", (row[0],))
+
+    def resize(self, page_size):
+        self.page_size = page_size
+        if not self.rows:
+            return self.first()
+        return self._load_forward("WHERE rowid >= ?", (self.rows[0][0],))
@@ -0,0 +1,227 @@
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Off unless INVENTORY_PROFILE=1 or configure() is called before the first
+# connection is opened; plain sqlite3 connections are used otherwise.
+ENABLED = os.environ.get("INVENTORY_PROFILE") == "1"
+SLOW_MS = float(os.environ.get("INVENTORY_SLOW_MS") or 0)   # 0 = no slow-query log
+SLOW_LOG = os.environ.get("INVENTORY_SLOW_LOG", "slow_queries.log")
+METRICS_FILE = os.environ.get("INVENTORY_METRICS")          # Prometheus text file
+
+MAX_SQL = 200
+# Frames in these files are skipped when looking for the caller
+SKIP_FILES = {"profiling.py", "db.py", "contextlib.py"}
+
+_stats = {}  # (kind, name, site) -> [calls, seconds, max seconds, rows]
+_lock = threading.Lock()
+
+def configure(enabled=True, slow_ms=None, slow_log=None, metrics_file=None):
+    global ENABLED, SLOW_MS, SLOW_LOG, METRICS_FILE
+    ENABLED = enabled
+    SLOW_MS = slow_ms if slow_ms is not None else SLOW_MS
+    SLOW_LOG = slow_log or SLOW_LOG
+    METRICS_FILE = metrics_file or METRICS_FILE
+
+# -------------------- Recording --------------------
+def call_site():
+    frame = sys._getframe(1)
+    while frame and os.path.basename(frame.f_code.co_filename) in SKIP_FILES:
+        frame = frame.f_back
+    if not frame:
+        return "-"
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+def normalize(sql):
+    return " ".join(sql.split())[:MAX_SQL]
+
+def record(kind, name, site, seconds, rows=0):
+    with _lock:
+        entry = _stats.get((kind, name, site))
+        if entry is None:
+            entry = _stats[(kind, name, site)] = [0, 0.0, 0.0, 0]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], seconds)
+        entry[3] += rows
+        if kind == "sql" and SLOW_MS and seconds * 1000 >= SLOW_MS:
+            with open(SLOW_LOG, "a") as f:
+                f.write(f"{datetime.now():%Y-%m-%d %H:%M:%S}\t{seconds * 1000:.1f} ms\t{rows} rows\t"
+                        f"{site}\t{name}\n")
+
+@contextmanager
+def timer(kind, name):
+    # Times a block of non-SQL work such as rendering a table
+    if not ENABLED:
+        yield
+        return
+    site = call_site()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, site, time.perf_counter() - start)
+
+# -------------------- Instrumented sqlite3 --------------------
+class ProfiledCursor(sqlite3.Cursor):
+    # A statement is recorded once it is finished: its time covers execute
+    # plus every fetch, until the rows run out, the cursor is re-executed
+    # or closed.
+    _run = None
+
+    def _start(self, sql, fn, *args):
+        self._finish()
+        run = self._run = [normalize(sql), call_site(), 0.0, 0]
+        start = time.perf_counter()
+        try:
+            fn(sql, *args)
+        finally:
+            run[2] += time.perf_counter() - start
+            if self.description is None:
+                self._finish()
+        return self
+
+    def _finish(self):
+        run, self._run = self._run, None
+        if run:
+            record("sql", *run)
+
+    def _fetch(self, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        if self._run:
+            self._run[2] += time.perf_counter() - start
+        return result
+
+    def execute(self, sql, parameters=()):
+        return self._start(sql, super().execute, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._start(sql, super().executemany, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._start(sql_script, super().executescript)
+
+    def fetchone(self):
+        row = self._fetch(super().fetchone)
+        if row is None:
+            self._finish()
+        elif self._run:
+            self._run[3] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        rows = self._fetch(super().fetchmany, size)
+        if self._run:
+            self._run[3] += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        if self._run:
+            self._run[3] += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._fetch(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._run:
+            self._run[3] += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        if self._run:
+            self._finish()
+
+class ProfiledConnection(sqlite3.Connection):
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        start = time.perf_counter()
+        super().commit()
+        record("sql", "COMMIT", call_site(), time.perf_counter() - start)
+
+    def rollback(self):
+        start = time.perf_counter()
+        super().rollback()
+        record("sql", "ROLLBACK", call_site(), time.perf_counter() - start)
+
+# -------------------- Reporting --------------------
+def snapshot():
+    with _lock:
+        return {key: list(value) for key, value in _stats.items()}
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+SUMMARY_HEADERS = ["Kind", "Statement", "Call Site", "Calls", "Total ms", "Avg ms", "Max ms", "Rows"]
+
+def summary(top=15):
+    # Most expensive statements and render steps by total time
+    rows = sorted(snapshot().items(), key=lambda item: item[1][1], reverse=True)[:top]
+    return [(kind, name if len(name) <= 60 else name[:57] + "...", site, calls,
+             round(seconds * 1000, 2), round(seconds * 1000 / calls, 3), round(longest * 1000, 2), count)
+            for (kind, name, site), (calls, seconds, longest, count) in rows]
+
+def label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+METRICS = [
+    ("calls_total", "counter", "Number of executions", 0),
+    ("seconds_total", "counter", "Total time spent in seconds", 1),
+    ("seconds_max", "gauge", "Slowest single execution in seconds", 2),
+    ("rows_total", "counter", "Rows returned", 3),
+]
+
+def prometheus_text():
+    stats = snapshot()
+    lines = []
+    for suffix, kind, help_text, index in METRICS:
+        for group in ("sql", "render"):
+            metric = f"inventory_{'query' if group == 'sql' else 'render'}_{suffix}"
+            series = [(key, value) for key, value in stats.items() if key[0] == group]
+            if not series or (group == "render" and suffix == "rows_total"):
+                continue
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for (_, name, site), value in series:
+                lines.append(f'{metric}{{statement="{label(name)}",site="{label(site)}"}} {value[index]}')
+    return "\n".join(lines) + "\n"
+
+def write_metrics(file_path=None):
+    # Written to a temp file and renamed so a scraper never reads half a file
+    file_path = file_path or METRICS_FILE
+    if not file_path:
+        return None
+    tmp = f"{file_path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, file_path)
+    return file_path
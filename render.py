@@ -0,0 +1,80 @@
+
+import sys
+from itertools import chain, islice
+from tabulate import tabulate
+
+SAMPLE_SIZE = 1000         # rows looked at to size the columns
+COMPACT_THRESHOLD = 500    # larger results are streamed in the compact format
+CHUNK_SIZE = 2000          # rows per write
+
+# -------------------- Helpers --------------------
+def cell(value):
+    if value is None:
+        return ""
+    return str(value)
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def sample_widths(rows, headers):
+    widths = [len(str(h)) for h in headers]
+    for row in rows:
+        for i, value in enumerate(row):
+            widths[i] = max(widths[i], len(cell(value)))
+    return widths
+
+def numeric_columns(rows, count):
+    # Right-align columns whose sampled values are all numbers, like tabulate
+    numeric = [True] * count
+    seen = [False] * count
+    for row in rows:
+        for i, value in enumerate(row):
+            if value is not None:
+                seen[i] = True
+                numeric[i] = numeric[i] and is_number(value)
+    return [n and s for n, s in zip(numeric, seen)]
+
+# -------------------- Rendering --------------------
+def render_table(rows, headers, out=None, widths=None, compact_above=COMPACT_THRESHOLD,
+                 sample_size=SAMPLE_SIZE):
+    # Small results are rendered by tabulate's grid as before. Larger ones
+    # are written row by row in a compact format sized from the first
+    # sample_size rows (or given widths, e.g. from query_widths; pass a
+    # function to compute them only when the compact format is used); a
+    # longer value later on just widens its own line. Returns the row count.
+    out = out or sys.stdout
+    rows = iter(rows)
+    head = list(islice(rows, max(sample_size, compact_above + 1)))
+    if len(head) <= compact_above:
+        if head:
+            out.write(tabulate(head, headers=headers, tablefmt="grid") + "\n")
+        return len(head)
+
+    sample = head[:sample_size]
+    widths = (widths() if callable(widths) else widths) or sample_widths(sample, headers)
+    widths = [max(w, len(str(h))) for w, h in zip(widths, headers)]
+    right = numeric_columns(sample, len(headers))
+
+    def line(values):
+        return "  ".join(text.rjust(w) if r else text.ljust(w)
+                         for text, w, r in zip(values, widths, right)).rstrip()
+
+    out.write(line([str(h) for h in headers]) + "\n")
+    out.write("  ".join("-" * w for w in widths) + "\n")
+    count = 0
+    rows = chain(head, rows)
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+        out.write("\n".join(line([cell(v) for v in row]) for row in chunk) + "\n")
+        count += len(chunk)
+    out.write(f"({count:,} rows)\n")
+    return count
+
+def query_widths(conn, sql, params, columns):
+    # Exact column widths computed by SQLite in one pass over the query
+    lengths = ", ".join(f"MAX(LENGTH(c{i}))" for i in range(columns))
+    names = ", ".join(f"c{i}" for i in range(columns))
+    row = conn.execute(f"WITH q({names}) AS ({sql}) SELECT {lengths} FROM q", params).fetchone()
+    return [width or 0 for width in row]
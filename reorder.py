@@ -0,0 +1,113 @@
+
+import math
+from datetime import datetime, timedelta
+
+from db import connection, transaction
+import locations
+
+WINDOW_DAYS = 30     # sales history used for velocity
+LEAD_TIME_DAYS = 7   # alert when stock runs out before a new order could arrive
+COVER_DAYS = 30      # a purchase order should last this long after it arrives
+MIN_STOCK = 5        # always alert at or below this quantity, even without sales
+
+STATE = "reorder"
+
+# -------------------- Velocity Table --------------------
+def create_reorder_state(conn):
+    # Units sold per product over the last WINDOW_DAYS, recomputed only for
+    # products with new sales (rowid watermark in summary_state), edited or
+    # deleted sales (triggers), or sales that have aged out of the window.
+    conn.execute("""CREATE TABLE IF NOT EXISTS reorder_velocity(
+                    product_id TEXT PRIMARY KEY,
+                    units INTEGER,
+                    oldest TEXT,
+                    computed_at TEXT) WITHOUT ROWID""")
+    conn.execute("""CREATE TABLE IF NOT EXISTS reorder_dirty(
+                    product_id TEXT PRIMARY KEY) WITHOUT ROWID""")
+    conn.execute("INSERT OR IGNORE INTO summary_state VALUES(?, 0)", (STATE,))
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_product_date ON sales(product_id, date, quantity)")
+    watermark = f"(SELECT last_rowid FROM summary_state WHERE name = '{STATE}')"
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_sales_reorder_delete AFTER DELETE ON sales
+                     WHEN old.rowid <= {watermark}
+                     BEGIN
+                         INSERT OR IGNORE INTO reorder_dirty VALUES (old.product_id);
+                         UPDATE summary_state SET last_rowid = MIN(last_rowid,
+                             (SELECT IFNULL(MAX(rowid), 0) FROM sales)) WHERE name = '{STATE}';
+                     END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_sales_reorder_update
+                     AFTER UPDATE OF product_id, quantity, date ON sales
+                     WHEN old.rowid <= {watermark}
+                     BEGIN
+                         INSERT OR IGNORE INTO reorder_dirty VALUES (old.product_id);
+                         INSERT OR IGNORE INTO reorder_dirty VALUES (new.product_id);
+                     END""")
+
+def refresh(now=None, path=None):
+    # Returns the number of products whose velocity was recomputed
+    now = now or datetime.now()
+    start = (now - timedelta(days=WINDOW_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    with transaction(path, immediate=True) as conn:
+        last = conn.execute("SELECT last_rowid FROM summary_state WHERE name=?", (STATE,)).fetchone()[0]
+        high = conn.execute("SELECT MAX(rowid) FROM sales").fetchone()[0] or 0
+        conn.execute("INSERT OR IGNORE INTO reorder_dirty SELECT product_id FROM sales WHERE rowid > ? AND rowid <= ?",
+                     (last, high))
+        conn.execute("INSERT OR IGNORE INTO reorder_dirty SELECT product_id FROM reorder_velocity WHERE oldest < ?",
+                     (start,))
+        touched = conn.execute("SELECT COUNT(*) FROM reorder_dirty").fetchone()[0]
+        conn.execute("DELETE FROM reorder_velocity WHERE product_id IN (SELECT product_id FROM reorder_dirty)")
+        conn.execute("""INSERT INTO reorder_velocity
+                        SELECT s.product_id, SUM(s.quantity), MIN(s.date), ?
+                        FROM reorder_dirty d JOIN sales s ON s.product_id = d.product_id AND s.date >= ?
+                        GROUP BY s.product_id""", (now.strftime("%Y-%m-%d %H:%M:%S"), start))
+        conn.execute("DELETE FROM reorder_dirty")
+        conn.execute("UPDATE summary_state SET last_rowid=? WHERE name=?", (high, STATE))
+    return touched
+
+# -------------------- Alerts & Purchase Orders --------------------
+def alerts(lead_time=LEAD_TIME_DAYS, cover=COVER_DAYS, min_stock=MIN_STOCK, path=None):
+    # Products that will run out within lead_time days at the current rate,
+    # or are at/below min_stock. Velocity counts sales at every location, so
+    # quantity is the stock across all of them. Rows: (product_id, name,
+    # supplier_id, price, quantity, units/day, days of stock or None,
+    # quantity to order).
+    refresh(path=path)
+    with connection(path) as conn:
+        rows = conn.execute(f"""SELECT p.product_id, p.name, p.supplier_id, p.price,
+                                       p.quantity + IFNULL(o.quantity, 0) AS stock,
+                                       IFNULL(v.units, 0) * 1.0 / ? AS velocity
+                                FROM products p
+                                LEFT JOIN ({locations.elsewhere_sql(conn)}) o ON o.product_id = p.product_id
+                                LEFT JOIN reorder_velocity v ON v.product_id = p.product_id
+                                WHERE stock <= ? OR stock < IFNULL(v.units, 0) * 1.0 / ? * ?
+                                ORDER BY p.supplier_id, p.product_id""",
+                            (WINDOW_DAYS, min_stock, WINDOW_DAYS, lead_time)).fetchall()
+    result = []
+    for pid, name, supplier_id, price, qty, velocity in rows:
+        days_left = round(qty / velocity, 1) if velocity else None
+        order_qty = max(math.ceil(velocity * (lead_time + cover)) - qty, min_stock + 1 - qty, 0)
+        result.append((pid, name, supplier_id, price, qty, round(velocity, 2), days_left, order_qty))
+    return result
+
+def purchase_orders(rows=None, path=None):
+    # Alert rows grouped by supplier: {supplier_id: (supplier name, [(product_id,
+    # name, order qty, unit price, line cost)], total cost)}
+    rows = alerts(path=path) if rows is None else rows
+    with connection(path) as conn:
+        names = dict(conn.execute("SELECT supplier_id, name FROM suppliers"))
+    orders = {}
+    for pid, name, supplier_id, price, _, _, _, order_qty in rows:
+        if order_qty <= 0:
+            continue
+        lines = orders.setdefault(supplier_id, [])
+        lines.append((pid, name, order_qty, price, round(order_qty * (price or 0), 2)))
+    return {sid: (names.get(sid, "-"), lines, round(sum(line[4] for line in lines), 2))
+            for sid, lines in orders.items()}
+
+def order_rows(orders):
+    # Flattened purchase order lines for tables and CSV
+    for sid, (supplier, lines, _) in sorted(orders.items(), key=lambda item: str(item[0])):
+        for line in lines:
+            yield (sid, supplier, *line)
+
+ALERT_HEADERS = ["Product ID", "Name", "Supplier ID", "Price", "Qty", "Units/Day", "Days Left", "Reorder Qty"]
+ORDER_HEADERS = ["Supplier ID", "Supplier", "Product ID", "Name", "Order Qty", "Unit Price", "Line Cost"]
@@ -0,0 +1,119 @@
+
+import os
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+
+import db
+
+PAGES = 2048        # pages copied per backup step (8 MiB at 4 KiB pages)
+PAUSE = 0.01        # seconds between steps, so writers get the database
+MAX_RESTARTS = 3    # incremental passes restarted by writes before one final pass
+
+class Restarted(Exception):
+    pass
+
+def default_path(path=None):
+    return f"{os.path.splitext(path or db.DB_NAME)[0]}_replica.db"
+
+# -------------------- Refresh --------------------
+def refresh(path=None, replica=None, pages=PAGES, pause=PAUSE, progress=None):
+    # Copies the live database into the replica with the online backup API,
+    # a few thousand pages at a time. A write to the live database between
+    # steps makes SQLite restart the copy. After MAX_RESTARTS of those, the
+    # rest is copied in one step, which in WAL mode still doesn't block
+    # writers. Readers of the replica keep their snapshot until the copy
+    # commits. Returns (pages, seconds).
+    path = path or db.DB_NAME
+    replica = replica or default_path(path)
+    start = time.perf_counter()
+    state = {"remaining": None, "restarts": 0, "total": 0}
+
+    def step(status, remaining, total):
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > MAX_RESTARTS:
+                raise Restarted()
+        state["remaining"], state["total"] = remaining, total
+        if progress:
+            progress(total - remaining, total)
+        if remaining and pause:
+            time.sleep(pause)
+
+    target = sqlite3.connect(replica, timeout=db.BUSY_TIMEOUT)
+    try:
+        with db.connection(path) as source:
+            try:
+                source.backup(target, pages=pages, progress=step)
+            except Restarted:
+                source.backup(target)
+        # The copy carries the live database's WAL mode and its own refresh time
+        target.execute("CREATE TABLE IF NOT EXISTS replica_state(refreshed_at TEXT, source TEXT, pages INTEGER)")
+        target.execute("DELETE FROM replica_state")
+        target.execute("INSERT INTO replica_state VALUES(?,?,?)",
+                       (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), os.path.abspath(path), state["total"]))
+        target.commit()
+    finally:
+        target.close()
+    return state["total"], time.perf_counter() - start
+
+def info(replica=None):
+    # (refreshed_at, age in seconds) or None when there is no replica yet
+    replica = replica or db.REPORT_DB or default_path()
+    if not os.path.exists(replica):
+        return None
+    conn = db.connect_read_only(replica)
+    try:
+        refreshed_at = conn.execute("SELECT refreshed_at FROM replica_state").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+    age = (datetime.now() - datetime.strptime(refreshed_at, "%Y-%m-%d %H:%M:%S")).total_seconds()
+    return refreshed_at, round(age)
+
+def use(replica=None, path=None):
+    # Points reports and exports at the replica, creating it if needed
+    replica = replica or default_path(path)
+    if info(replica) is None:
+        refresh(path, replica)
+    db.REPORT_DB = replica
+    return replica
+
+def run_forever(every, path=None, replica=None):
+    while True:
+        pages, seconds = refresh(path, replica)
+        print(f"✅ {datetime.now():%H:%M:%S} replica refreshed: {pages:,} pages in {seconds:.2f}s")
+        time.sleep(every)
+
+# -------------------- Command Line --------------------
+def add_arguments(parser):
+    actions = parser.add_subparsers(dest="action", required=True)
+    refresh_cmd = actions.add_parser("refresh", help="copy the live database into the replica")
+    refresh_cmd.add_argument("--every", type=float, help="keep refreshing every SECONDS")
+    actions.add_parser("status", help="show when the replica was last refreshed")
+    for action in actions.choices.values():
+        action.add_argument("--file", dest="replica_file", help="replica file (default: <db>_replica.db)")
+
+def run(args):
+    replica = args.replica_file or default_path(args.db)
+    if args.action == "status":
+        state = info(replica)
+        if not state:
+            print(f"⚠️ No replica at {replica} yet. Create it with: replica refresh")
+            return
+        print(f"✅ {replica} refreshed at {state[0]} ({state[1]}s ago)")
+    elif args.every:
+        run_forever(args.every, args.db, replica)
+    else:
+        pages, seconds = refresh(args.db, replica,
+                                 progress=lambda done, total: print(f"\r   {done:,}/{total:,} pages...",
+                                                                    end="", flush=True))
+        print(f"\n✅ {replica} refreshed: {pages:,} pages in {seconds:.2f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain a read-only replica for reports")
+    parser.add_argument("--db", default=db.DB_NAME)
+    add_arguments(parser)
+    run(parser.parse_args())
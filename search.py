@@ -0,0 +1,57 @@
+
+from db import connection
+
+RESULT_LIMIT = 20
+
+# kind -> (table, id column, extra column shown as details)
+ENTITIES = {
+    "supplier": ("suppliers", "supplier_id", "contact"),
+    "product": ("products", "product_id", "category"),
+    "customer": ("customers", "customer_id", "contact"),
+}
+
+# -------------------- Helpers --------------------
+def match_query(text):
+    # Every word must match, each as a prefix: 'acm sup' -> "acm"* "sup"*
+    words = [w.replace('"', '""') for w in text.split()]
+    return " ".join(f'"{w}"*' for w in words)
+
+def has_fts(conn, table):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name=?",
+                        (f"{table}_fts",)).fetchone() is not None
+
+# -------------------- Search --------------------
+def search_table(kind, text, limit=RESULT_LIMIT, path=None):
+    # Full rows of one table, best bm25 match first
+    table = ENTITIES[kind][0]
+    query = match_query(text)
+    if not query:
+        return []
+    with connection(path) as conn:
+        if not has_fts(conn, table):
+            return conn.execute(f"SELECT * FROM {table} WHERE name LIKE ? LIMIT ?",
+                                (f"%{text}%", limit)).fetchall()
+        return conn.execute(f"""SELECT t.* FROM {table}_fts f JOIN {table} t ON t.rowid = f.rowid
+                                WHERE {table}_fts MATCH ? ORDER BY f.rank LIMIT ?""",
+                            (query, limit)).fetchall()
+
+def search(text, kinds=None, limit=RESULT_LIMIT, path=None):
+    # Unified search: (kind, id, name, details, rank) across tables
+    query = match_query(text)
+    if not query:
+        return []
+    results = []
+    with connection(path) as conn:
+        for kind in kinds or ENTITIES:
+            table, key, details = ENTITIES[kind]
+            if has_fts(conn, table):
+                rows = conn.execute(f"""SELECT ?, t.{key}, t.name, t.{details}, f.rank
+                                        FROM {table}_fts f JOIN {table} t ON t.rowid = f.rowid
+                                        WHERE {table}_fts MATCH ? ORDER BY f.rank LIMIT ?""",
+                                    (kind, query, limit))
+            else:
+                rows = conn.execute(f"SELECT ?, {key}, name, {details}, 0 FROM {table} "
+                                    f"WHERE name LIKE ? LIMIT ?", (kind, f"%{text}%", limit))
+            results.extend(rows)
+    results.sort(key=lambda r: r[4])
+    return results[:limit]
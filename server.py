@@ -0,0 +1,344 @@
+
+import json
+import base64
+import asyncio
+import argparse
+from itertools import islice
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import services
+import analytics
+from db import transaction
+from checkout import apply_checkout
+from search import search
+from cache import product_cache
+import auth
+import locations
+import replica
+
+MAX_BATCH = 256       # writes committed together by the writer task
+MAX_BODY = 1 << 20    # bytes
+PAGE_LIMIT = 100
+
+# URL collection -> services kind
+COLLECTIONS = {"suppliers": "supplier", "products": "product", "customers": "customer", "sales": "sale"}
+# kind -> roles that may create, change or delete it (as in the menus:
+# salespeople only view suppliers and products). Any role may read.
+WRITE_ROLES = {"supplier": {"admin"}, "product": {"admin"},
+               "customer": {"admin", "salesperson"}, "sale": {"admin", "salesperson"}}
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# -------------------- Write Queue --------------------
+class WriteQueue:
+    # All writes go through one task and one connection. Whatever is queued
+    # when the writer wakes up is committed in a single transaction (group
+    # commit), each operation under its own SAVEPOINT so one failure doesn't
+    # undo its neighbours. Readers never wait on 'database is locked'.
+    def __init__(self, max_batch=MAX_BATCH, path=None):
+        self.max_batch = max_batch
+        self.path = path
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+        self.commits = 0
+        self.operations = 0
+
+    async def submit(self, fn, *args):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((fn, args, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(self.executor, self._commit, batch)
+            except Exception as e:
+                results = [(False, e)] * len(batch)
+            product_cache.flush()
+            for (_, _, future), (ok, value) in zip(batch, results):
+                if future.cancelled():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _commit(self, batch):
+        results = []
+        with transaction(self.path, immediate=True, setup=locations.attach) as conn:
+            for fn, args, _ in batch:
+                conn.execute("SAVEPOINT op")
+                try:
+                    results.append((True, fn(conn, *args)))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    results.append((False, e))
+                conn.execute("RELEASE op")
+        self.commits += 1
+        self.operations += len(batch)
+        return results
+
+# -------------------- Handlers --------------------
+def as_dicts(kind, rows):
+    table, key, _, columns = services.ENTITIES[kind]
+    names = [key] + columns
+    return [dict(zip(names, row)) for row in rows]
+
+def first(query, name, default=None):
+    return query.get(name, [default])[0]
+
+def int_param(query, name, default=None):
+    value = first(query, name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise HttpError(400, f"{name} must be an integer")
+
+TYPE_NAMES = {str: "a string", int: "an integer", float: "a number"}
+
+def check_body(kind, data, adding):
+    # Same fields as the CLI: adding needs every required one, and values
+    # must already have the field's JSON type
+    if not isinstance(data, dict):
+        raise HttpError(400, "Expected a JSON object")
+    fields = {field: (convert, required) for field, convert, required in services.FIELDS[kind]}
+    unknown = set(data) - set(fields)
+    if unknown:
+        raise HttpError(400, f"Unknown field(s): {', '.join(sorted(unknown))}")
+    missing = [field for field, (_, required) in fields.items()
+               if adding and required and data.get(field) in (None, "")]
+    if missing:
+        raise HttpError(400, f"Missing field(s): {', '.join(missing)}")
+    for field, value in data.items():
+        convert = fields[field][0]
+        types = (int, float) if convert is float else convert
+        if value is not None and (not isinstance(value, types) or isinstance(value, bool)):
+            raise HttpError(400, f"{field} must be {TYPE_NAMES[convert]}")
+    # Stock never goes below zero, whichever path sets it
+    if kind == "product" and isinstance(data.get("quantity"), int) and data["quantity"] < 0:
+        raise HttpError(400, "quantity can't be negative")
+    return data
+
+class App:
+    def __init__(self, path=None, readers=db.POOL_SIZE, require_auth=False):
+        self.path = path
+        self.require_auth = require_auth
+        self.writes = WriteQueue(path=path)
+        self.readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="reader")
+
+    async def read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.readers, fn, *args)
+
+    async def user(self, authorization):
+        # Bearer tokens come from POST /login; Basic credentials are checked
+        # once and then served from the credential cache
+        scheme, _, value = authorization.partition(" ")
+        if scheme.lower() == "bearer":
+            return auth.sessions.get(value.strip())
+        if scheme.lower() == "basic":
+            try:
+                username, _, password = base64.b64decode(value.strip()).decode().partition(":")
+            except ValueError:
+                return None
+            return await self.read(auth.check_credentials, username, password, self.path)
+        return None
+
+    async def dispatch(self, method, target, body, headers=None):
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        query = parse_qs(url.query)
+        data = json.loads(body) if body else {}
+        headers = headers or {}
+
+        if parts == ["login"] and method == "POST":
+            result = await self.read(auth.login, data.get("username", ""), data.get("password", ""), self.path)
+            if not result:
+                raise HttpError(401, "Invalid credentials")
+            token, user = result
+            return 200, {"token": token, "username": user[1], "role": user[3], "expires_in": auth.SESSION_TTL}
+        if parts == ["logout"] and method == "POST":
+            token = headers.get("authorization", "").partition(" ")[2].strip()
+            return 200, {"logged_out": auth.logout(token)}
+        user = None
+        if self.require_auth and parts != ["health"]:
+            user = await self.user(headers.get("authorization", ""))
+            if not user:
+                raise HttpError(401, "Login required")
+
+        if parts == ["health"]:
+            return 200, {"status": "ok", "commits": self.writes.commits,
+                         "writes": self.writes.operations, "queued": self.writes.queue.qsize(),
+                         "product_cache": product_cache.stats(),
+                         "replica": db.REPORT_DB and dict(zip(["refreshed_at", "age_seconds"],
+                                                              await self.read(replica.info, db.REPORT_DB) or ()))}
+        if parts and parts[0] in COLLECTIONS:
+            kind = COLLECTIONS[parts[0]]
+            if user and method != "GET" and user[3] not in WRITE_ROLES[kind]:
+                raise HttpError(403, f"{user[3]} accounts can't change {parts[0]}")
+            return await self.collection(method, kind, parts[1:], query, data)
+        if len(parts) == 2 and parts[0] == "reports" and method == "GET":
+            name = f"{parts[1]}_report"
+            if name not in services.REPORTS:
+                raise HttpError(404, f"No report named {parts[1]}")
+            since, until = first(query, "since"), first(query, "until")
+            # Paged like the collections: ?offset=N&limit=N (at most 1000 rows)
+            offset = max(int_param(query, "offset", 0), 0)
+            limit = min(max(int_param(query, "limit", PAGE_LIMIT), 0), 1000)
+            rows = await self.read(lambda: list(islice(services.report_rows(name, since, until),
+                                                       offset, offset + limit)))
+            headers = services.report_headers(name)
+            return 200, [dict(zip(headers, row)) for row in rows]
+        if len(parts) == 2 and parts[0] == "analytics" and method == "GET":
+            if parts[1] not in analytics.HEADERS:
+                raise HttpError(404, f"No analytics report named {parts[1]}")
+            rows = await self.read(analytics.report, parts[1], first(query, "since"), first(query, "until"),
+                                   int_param(query, "top"), first(query, "summary") == "1")
+            return 200, [dict(zip(analytics.HEADERS[parts[1]], row)) for row in rows]
+        if parts == ["search"] and method == "GET":
+            rows = await self.read(search, first(query, "q", ""), None, int_param(query, "limit", 20))
+            return 200, [dict(zip(["type", "id", "name", "details", "rank"], row)) for row in rows]
+        raise HttpError(404, "Not found")
+
+    async def collection(self, method, kind, rest, query, data):
+        if not rest:
+            if method == "GET":
+                rows = await self.read(services.list_page, kind, first(query, "after"),
+                                       min(max(int_param(query, "limit", PAGE_LIMIT), 1), 1000))
+                return 200, as_dicts(kind, rows)
+            if method == "POST" and kind == "sale":
+                if not isinstance(data, dict) or not isinstance(data.get("items", []), list):
+                    raise HttpError(400, "Expected a JSON object with an items list")
+                items = [(item["product_id"], item["qty"]) for item in data.get("items", [])]
+                if not data.get("customer_id") or not items:
+                    raise HttpError(400, "customer_id and items are required")
+                result = await self.writes.submit(apply_checkout, data["customer_id"], items,
+                                                  bool(data.get("allow_partial")), data.get("location"))
+                return (201 if result["committed"] else 409), result
+            if method == "POST":
+                new_id = await self.writes.submit(services.insert_row, kind, check_body(kind, data, True))
+                return 201, {"id": new_id}
+            raise HttpError(405, f"{method} not allowed here")
+        if len(rest) != 1:
+            raise HttpError(404, "Not found")
+        key = rest[0]
+        if method == "GET":
+            row = await self.read(services.get, kind, key)
+            if not row:
+                raise HttpError(404, f"{kind} {key} not found")
+            return 200, as_dicts(kind, [row])[0]
+        if method == "PATCH":
+            found = await self.writes.submit(services.update_row, kind, key, check_body(kind, data, False))
+        elif method == "DELETE":
+            found = await self.writes.submit(services.delete_row, kind, key)
+        else:
+            raise HttpError(405, f"{method} not allowed here")
+        if not found:
+            raise HttpError(404, f"{kind} {key} not found")
+        return 200, {"id": key}
+
+    # -------------------- HTTP --------------------
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, version = line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, payload = 413, {"error": "Request body too large"}
+                    body = b""
+                else:
+                    body = await reader.readexactly(length)
+                    status, payload = await self.respond(method, target, body, headers)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                data = json.dumps(payload, default=str).encode()
+                writer.write((f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                              f"Content-Type: application/json\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + data)
+                await writer.drain()
+                if not keep_alive or status == 413:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, method, target, body, headers=None):
+        try:
+            return await self.dispatch(method, target, body, headers)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+async def refresh_replica(every, path=None):
+    # Reports read the replica; it is refreshed off the event loop
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(every)
+        await loop.run_in_executor(None, replica.refresh, path, db.REPORT_DB)
+
+async def serve(host="127.0.0.1", port=8080, path=None, require_auth=False, replica_every=None):
+    app = App(path, require_auth=require_auth)
+    tasks = [asyncio.create_task(app.writes.run())]
+    if replica_every:
+        replica.use(path=path)
+        tasks.append(asyncio.create_task(refresh_replica(replica_every, path)))
+    server = await asyncio.start_server(app.handle, host, port)
+    print(f"✅ Serving {path or db.DB_NAME} on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def add_arguments(parser):
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--auth", action="store_true",
+                        help="require a Bearer token from POST /login (or Basic credentials)")
+    parser.add_argument("--replica-every", type=float, metavar="SECONDS",
+                        help="serve reports from a replica refreshed this often")
+
+def run(args):
+    services.init_db()
+    product_cache.warm()
+    try:
+        asyncio.run(serve(args.host, args.port, require_auth=args.auth, replica_every=args.replica_every))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the inventory database over HTTP/JSON")
+    parser.add_argument("--db", default=db.DB_NAME)
+    add_arguments(parser)
+    args = parser.parse_args()
+    db.DB_NAME = args.db
+    run(args)
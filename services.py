@@ -0,0 +1,240 @@
+
+from db import connection, transaction, reading
+from ids import ensure_sequences, next_id
+from checkout import checkout
+from export import REPORTS, BATCH_SIZE, report_query
+from migrations import migrate
+from cache import product_cache
+import ledger
+import locations
+from render import query_widths
+import auth
+
+# kind -> (table, id column, ID prefix, editable columns in table order)
+ENTITIES = {
+    "supplier": ("suppliers", "supplier_id", "SP", ["name", "contact", "address"]),
+    "product": ("products", "product_id", "PR",
+                ["name", "category", "size", "quantity", "price", "supplier_id"]),
+    "customer": ("customers", "customer_id", "CU", ["name", "contact"]),
+    "sale": ("sales", "sale_id", "SL", ["product_id", "customer_id", "quantity", "total", "date"]),
+}
+
+# Field options for add/update; add requires the ones marked True
+FIELDS = {
+    "supplier": [("name", str, True), ("contact", str, True), ("address", str, True)],
+    "product": [("name", str, True), ("category", str, True), ("size", str, True),
+                ("quantity", int, True), ("price", float, True), ("supplier_id", str, True)],
+    "customer": [("name", str, True), ("contact", str, True)],
+    # Sales are added through checkout; these are for update only
+    "sale": [("product_id", str, False), ("customer_id", str, False), ("quantity", int, False),
+             ("total", float, False), ("date", str, False)],
+}
+
+# -------------------- Database Init --------------------
+def init_db(path=None):
+    with transaction(path) as conn:
+        cur = conn.cursor()
+        # Users
+        cur.execute("""CREATE TABLE IF NOT EXISTS users(
+                        user_id TEXT PRIMARY KEY,
+                        username TEXT UNIQUE,
+                        password TEXT,
+                        role TEXT)""")
+        # Suppliers
+        cur.execute("""CREATE TABLE IF NOT EXISTS suppliers(
+                        supplier_id TEXT PRIMARY KEY,
+                        name TEXT,
+                        contact TEXT,
+                        address TEXT)""")
+        # Products
+        cur.execute("""CREATE TABLE IF NOT EXISTS products(
+                        product_id TEXT PRIMARY KEY,
+                        name TEXT,
+                        category TEXT,
+                        size TEXT,
+                        quantity INTEGER,
+                        price REAL,
+                        supplier_id TEXT,
+                        FOREIGN KEY(supplier_id) REFERENCES suppliers(supplier_id))""")
+        # Customers
+        cur.execute("""CREATE TABLE IF NOT EXISTS customers(
+                        customer_id TEXT PRIMARY KEY,
+                        name TEXT,
+                        contact TEXT)""")
+        # Sales
+        cur.execute("""CREATE TABLE IF NOT EXISTS sales(
+                        sale_id TEXT PRIMARY KEY,
+                        product_id TEXT,
+                        customer_id TEXT,
+                        quantity INTEGER,
+                        total REAL,
+                        date TEXT,
+                        FOREIGN KEY(product_id) REFERENCES products(product_id),
+                        FOREIGN KEY(customer_id) REFERENCES customers(customer_id))""")
+        # Default users
+        cur.execute("SELECT * FROM users")
+        if not cur.fetchall():
+            cur.execute("INSERT INTO users VALUES(?,?,?,?)",
+                        ("U_1", "admin", auth.hash_password("admin123"), "admin"))
+            cur.execute("INSERT INTO users VALUES(?,?,?,?)",
+                        ("U_2", "sales", auth.hash_password("sales123"), "salesperson"))
+        ensure_sequences(conn)
+    migrate(path)
+
+# -------------------- Authentication --------------------
+def authenticate(username, password):
+    # Passwords are stored as salted scrypt hashes (auth.py)
+    return auth.authenticate(username, password)
+
+def list_users():
+    with connection() as conn:
+        return conn.execute("SELECT user_id, username, role FROM users ORDER BY rowid").fetchall()
+
+def add_user(username, password, role):
+    with transaction(immediate=True) as conn:
+        user_id = next_id(conn, "U")
+        conn.execute("INSERT INTO users VALUES(?,?,?,?)",
+                     (user_id, username, auth.hash_password(password), role))
+    return user_id
+
+# -------------------- CRUD --------------------
+def list_rows(kind, batch_size=BATCH_SIZE):
+    table, key = ENTITIES[kind][:2]
+    with connection() as conn:
+        cur = conn.execute(f"SELECT * FROM {table} ORDER BY rowid")
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+def list_page(kind, after=None, limit=100):
+    # Keyset page of rows following the row with key 'after'
+    table, key = ENTITIES[kind][:2]
+    with connection() as conn:
+        if after is None:
+            return conn.execute(f"SELECT * FROM {table} ORDER BY rowid LIMIT ?", (limit,)).fetchall()
+        return conn.execute(f"""SELECT * FROM {table}
+                                WHERE rowid > (SELECT rowid FROM {table} WHERE {key}=?)
+                                ORDER BY rowid LIMIT ?""", (after, limit)).fetchall()
+
+def get(kind, key_value):
+    if kind == "product":
+        return product_cache.get(key_value)
+    table, key = ENTITIES[kind][:2]
+    with connection() as conn:
+        return conn.execute(f"SELECT * FROM {table} WHERE {key}=?", (key_value,)).fetchone()
+
+# The *_row functions work inside the caller's transaction so writers that
+# batch several operations per commit can share them. Callers flush the
+# product cache once the transaction has committed.
+def insert_row(conn, kind, values):
+    table, _, prefix, columns = ENTITIES[kind]
+    new_id = next_id(conn, prefix)
+    conn.execute(f"INSERT INTO {table} VALUES({','.join('?' * (len(columns) + 1))})",
+                 (new_id, *[values.get(col) for col in columns]))
+    if kind == "product":
+        ledger.log(conn, [(new_id, ledger.OPENING, values.get("quantity") or 0, None, None)])
+    return new_id
+
+def update_row(conn, kind, key_value, changes):
+    # Only the given columns change; returns False when the row doesn't exist
+    table, key, _, columns = ENTITIES[kind]
+    changes = {col: value for col, value in changes.items() if value is not None}
+    unknown = set(changes) - set(columns)
+    if unknown:
+        raise ValueError(f"Unknown {kind} field(s): {', '.join(sorted(unknown))}")
+    # Values arrive as typed text from the menus; stored with the field's type
+    types = {field: convert for field, convert, _ in FIELDS[kind]}
+    for col, value in changes.items():
+        try:
+            changes[col] = types[col](value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid {col}: {value!r}")
+    if kind == "sale" and changes.get("quantity", 1) < 1:
+        raise ValueError("Sale quantity must be at least 1")
+    row = conn.execute(f"SELECT * FROM {table} WHERE {key}=?", (key_value,)).fetchone()
+    if not row:
+        return False
+    # Stock only changes through the ledger
+    if kind == "product" and "quantity" in changes:
+        ledger.adjust(conn, key_value, changes.pop("quantity"), "product updated")
+    if not changes:
+        return True
+    if kind == "product":
+        product_cache.invalidate([key_value])
+    assignments = ", ".join(f"{col}=?" for col in changes)
+    conn.execute(f"UPDATE {table} SET {assignments} WHERE {key}=?", (*changes.values(), key_value))
+    if kind == "sale" and ("product_id" in changes or "quantity" in changes):
+        new = conn.execute("SELECT product_id, quantity FROM sales WHERE sale_id=?", (key_value,)).fetchone()
+        if new != (row[1], row[3]):
+            locations.sale_changed(conn, key_value, (row[1], row[3]), new)
+    return True
+
+def delete_row(conn, kind, key_value):
+    table, key = ENTITIES[kind][:2]
+    if kind == "product":
+        product_cache.invalidate([key_value])
+    if kind == "sale":
+        old = conn.execute("SELECT product_id, quantity FROM sales WHERE sale_id=?", (key_value,)).fetchone()
+        if old:
+            locations.sale_changed(conn, key_value, old, None)
+    return conn.execute(f"DELETE FROM {table} WHERE {key}=?", (key_value,)).rowcount == 1
+
+def add(kind, **values):
+    with transaction(immediate=True) as conn:
+        return insert_row(conn, kind, values)
+
+def update(kind, key_value, **changes):
+    with transaction(immediate=True, setup=locations.attach) as conn:
+        found = update_row(conn, kind, key_value, changes)
+    product_cache.flush()
+    return found
+
+def delete(kind, key_value):
+    with transaction(immediate=True, setup=locations.attach) as conn:
+        found = delete_row(conn, kind, key_value)
+    product_cache.flush()
+    return found
+
+# -------------------- Sales --------------------
+def record_sale(customer_id, basket, allow_partial=False, location=None):
+    return checkout(customer_id, basket, allow_partial, location=location)
+
+# -------------------- Stock --------------------
+def receive_stock(product_id, quantity, reference=None, note=None):
+    with transaction(immediate=True) as conn:
+        balance = ledger.receive(conn, product_id, quantity, reference, note)
+    product_cache.flush()
+    return balance
+
+def return_sale(sale_id, quantity=None, note=None):
+    with transaction(immediate=True, setup=locations.attach) as conn:
+        balance = locations.return_sale(conn, sale_id, quantity, note)
+    product_cache.flush()
+    return balance
+
+def adjust_stock(product_id, counted, note=None):
+    with transaction(immediate=True) as conn:
+        balance = ledger.adjust(conn, product_id, counted, note)
+    product_cache.flush()
+    return balance
+
+# -------------------- Reports --------------------
+def report_headers(name):
+    return REPORTS[name][1]
+
+def report_widths(name, since=None, until=None):
+    sql, params, headers = report_query(name, since, until)
+    with reading() as conn:
+        return query_widths(conn, sql, params, len(headers))
+
+def report_rows(name, since=None, until=None, batch_size=BATCH_SIZE):
+    sql, params, _ = report_query(name, since, until)
+    with reading() as conn:
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows